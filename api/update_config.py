@@ -1,6 +1,9 @@
 from http.server import BaseHTTPRequestHandler
 import json
-from reagent_optimizer import ReagentOptimizer
+import threading
+from optimizer_service import config_from_json, config_to_json
+from tray_config import TrayConfig
+from tray_editor import TrayEditor, default_optimizer
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
@@ -8,18 +11,19 @@ class handler(BaseHTTPRequestHandler):
         post_data = self.rfile.read(content_length)
         data = json.loads(post_data.decode('utf-8'))
 
-        # Get the current config and selected experiments from session state
-        config = self.server.app.session_state.config
-        selected_experiments = self.server.app.session_state.selected_experiments
-
-        # Update the config
+        # The client sends the config it is editing; no server-side session is needed
+        selected_experiments = data.get('selected_experiments', [])
         source = data['source']
         target = data['target']
-        optimizer = ReagentOptimizer()
-        updated_config = update_config_after_manual_change(config, source, target)
 
-        # Save the updated config to session state
-        self.server.app.session_state.config = updated_config
+        # Compact TrayConfig payloads are swapped and returned in compact form
+        if 'v' in data['config']:
+            tray = TrayConfig.from_json(data['config'])
+            tray.swap(source, target)
+            config_payload = tray.to_jsonable()
+        else:
+            config = config_from_json(data['config'])
+            config_payload = config_to_json(update_config_after_manual_change(config, source, target))
 
         # Send the response
         self.send_response(200)
@@ -27,20 +31,22 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
         response = json.dumps({
             'success': True,
-            'config': updated_config,
+            'config': config_payload,
             'selected_experiments': selected_experiments
         })
         self.wfile.write(response.encode('utf-8'))
 
-def update_config_after_manual_change(config, source, target):
-    source_loc = config["tray_locations"][source]
-    target_loc = config["tray_locations"][target]
-    
-    config["tray_locations"][source], config["tray_locations"][target] = target_loc, source_loc
-
-    # Recalculate total tests and update sets
-    optimizer = ReagentOptimizer()
-    optimizer._recalculate_total_tests(config)
-
+# The last editor is kept so repeated swaps on the same config reuse its
+# placement index; a new payload only needs its own index built
+_editor = None
+_editor_lock = threading.Lock()
+
+def update_config_after_manual_change(config, source, target, optimizer=None):
+    # Only the swapped placements, their sets and experiments are recalculated
+    global _editor
+    optimizer = optimizer or default_optimizer()
+    with _editor_lock:
+        if _editor is None or _editor.config is not config or _editor.optimizer is not optimizer:
+            _editor = TrayEditor(config, optimizer)
+        _editor.swap(source, target)
     return config
-
@@ -1,7 +1,15 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from reagent_optimizer import ReagentOptimizer
+from config_index import load_index
+from reagent_optimizer import CapacityError, ReagentOptimizer
+from result_cache import ResultCache
+from tray_config import TrayConfig
 
 # Set page config
 st.set_page_config(
@@ -39,64 +47,96 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def get_reagent_color(reagent_code):
-    color_map = {
-        'gray': ['KR1E', 'KR1S', 'KR2S', 'KR3E', 'KR3S', 'KR4E', 'KR4S', 'KR5E', 'KR5S', 'KR6E1', 'KR6E2', 'KR6E3', 'KR13E1', 'KR13S', 'KR14E', 'KR14S', 'KR15E', 'KR15S'],
-        'violet': ['KR7E1', 'KR7E2', 'KR8E1', 'KR8E2', 'KR19E1', 'KR19E2', 'KR19E3', 'KR20E', 'KR36E1', 'KR36E2', 'KR40E1', 'KR40E2'],
-        'green': ['KR9E1', 'KR9E2', 'KR17E1', 'KR17E2', 'KR17E3', 'KR28E1', 'KR28E2', 'KR28E3'],
-        'orange': ['KR10E1', 'KR10E2', 'KR10E3', 'KR12E1', 'KR12E2', 'KR12E3', 'KR18E1', 'KR18E2', 'KR22E1', 'KR27E1', 'KR27E2', 'KR42E1', 'KR42E2'],
-        'white': ['KR11E', 'KR21E1'],
-        'blue': ['KR16E1', 'KR16E2', 'KR16E3', 'KR16E4', 'KR30E1', 'KR30E2', 'KR30E3', 'KR31E1', 'KR31E2', 'KR34E1', 'KR34E2'],
-        'red': ['KR29E1', 'KR29E2', 'KR29E3'],
-        'yellow': ['KR35E1', 'KR35E2']
-    }
-    for color, reagents in color_map.items():
-        if any(reagent_code.startswith(r) for r in reagents):
-            return color
-    return 'lightgray'  # Default color if not found
+# Set CFTRAY_PROFILE=1 to record per-section rerun timings in
+# st.session_state._profile (read by scripts/app_load_test.py)
+PROFILE = bool(os.environ.get("CFTRAY_PROFILE"))
+
+@contextmanager
+def profile_section(name):
+    if not PROFILE:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = st.session_state.setdefault("_profile", {})
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+def _tray_key(config, tray_data):
+    # Colors come from data/colors.json via the optimizer's tray data
+    return tuple(
+        (loc['reagent_code'], loc['tests_possible'], ", #".join(str(exp) for exp in loc.get('shared_by', [loc['experiment']])),
+         tray_data.reagent_color(loc['reagent_code']))
+        if loc else None
+        for loc in config["tray_locations"]
+    )
 
 def create_tray_visualization(config):
-    locations = config["tray_locations"]
-    fig = go.Figure()
-
-    for i, loc in enumerate(locations):
-        row = i // 4
-        col = i % 4
-        color = get_reagent_color(loc['reagent_code']) if loc else 'lightgray'
-        opacity = 0.8 if loc else 0.2
-
-        fig.add_trace(go.Scatter(
-            x=[col, col+1, col+1, col, col],
-            y=[row, row, row+1, row+1, row],
-            fill="toself",
+    # Identical trays share one figure across reruns and sessions
+    tray_data = get_optimizer().tray_data
+    return _build_tray_figure(_tray_key(config, tray_data), tray_data.columns)
+
+@st.cache_resource(max_entries=256)
+def _build_tray_figure(tray_key, columns):
+    shapes = []
+    xs, ys, labels = [], [], []
+    rows = -(-len(tray_key) // columns)
+    hover = [[None] * columns for _ in range(rows)]
+
+    for i, loc in enumerate(tray_key):
+        row = i // columns
+        col = i % columns
+        if loc:
+            code, tests, exp, color = loc
+            opacity = 0.8
+        else:
+            code, tests, exp = 'Empty', 'N/A', 'N/A'
+            color, opacity = 'lightgray', 0.2
+
+        shapes.append(dict(
+            type="rect",
+            x0=col, y0=row, x1=col + 1, y1=row + 1,
             fillcolor=color,
             opacity=opacity,
             line=dict(color="black", width=1),
-            mode="lines",
-            name=f"LOC-{i+1}",
-            text=f"LOC-{i+1}<br>{loc['reagent_code'] if loc else 'Empty'}<br>Tests: {loc['tests_possible'] if loc else 'N/A'}<br>Exp: #{loc['experiment'] if loc else 'N/A'}",
-            hoverinfo="text"
+            layer="below"
         ))
+        xs.append(col + 0.5)
+        ys.append(row + 0.5)
+        labels.append(f"<b>LOC-{i+1}</b><br><b>{code}</b><br>Tests: {tests}<br>Exp: #{exp}")
+        hover[row][col] = f"LOC-{i+1}<br>{code}<br>Tests: {tests}<br>Exp: #{exp}"
 
-        # Add text annotation
-        fig.add_annotation(
-            x=(col + col + 1) / 2,
-            y=(row + row + 1) / 2,
-           text=f"<b>LOC-{i+1}</b><br>{'<b>' + loc['reagent_code'] if loc else 'Empty</b>'}<br>Tests: {loc['tests_possible'] if loc else 'N/A'}<br>Exp: #{loc['experiment'] if loc else 'N/A'}",
-            showarrow=False,
-            font=dict(color="black", size=14),
-            align="center",
-            xanchor="center",
-            yanchor="middle"
+    # One text trace carries every label; a transparent heatmap with one cell
+    # per location makes the whole cell show its hover box, as filled shapes did
+    fig = go.Figure([
+        go.Heatmap(
+            x=[col + 0.5 for col in range(columns)],
+            y=[row + 0.5 for row in range(rows)],
+            z=[[0 if text else None for text in hover_row] for hover_row in hover],
+            text=hover,
+            hoverinfo="text",
+            colorscale=[[0, "rgba(0,0,0,0)"], [1, "rgba(0,0,0,0)"]],
+            showscale=False
+        ),
+        go.Scatter(
+            x=xs,
+            y=ys,
+            mode="text",
+            text=labels,
+            hoverinfo="skip",
+            textfont=dict(color="black", size=14)
         )
+    ])
 
     fig.update_layout(
         title="Tray Configuration",
         showlegend=False,
         height=600,
         width=800,
-        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        shapes=shapes,
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[0, columns]),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[0, rows]),
         plot_bgcolor="rgba(0,0,0,0)",
         margin=dict(l=20, r=20, t=40, b=20)
     )
@@ -106,12 +146,12 @@ def create_tray_visualization(config):
 def display_results(config, selected_experiments):
     col1, col2 = st.columns([3, 2])
 
-    with col1:
+    with col1, profile_section("results/figure"):
         st.subheader("Tray Configuration")
         fig = create_tray_visualization(config)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, width="stretch")
 
-    with col2:
+    with col2, profile_section("results/summary"):
         st.subheader("Results Summary")
         tray_life = min(result["total_tests"] for result in config["results"].values())
         st.metric("Tray Life (Tests)", tray_life)
@@ -123,81 +163,179 @@ def display_results(config, selected_experiments):
             }
             for exp_num, result in config["results"].items()
         ])
-        st.dataframe(results_df, use_container_width=True)
-
-    st.subheader("Detailed Results")
-    for exp_num, result in config["results"].items():
-        with st.expander(f"{result['name']} (#{exp_num}) - {result['total_tests']} total tests"):
-            for i, set_info in enumerate(result["sets"]):
-                st.markdown(f"**{'Primary' if i == 0 else 'Additional'} Set {i+1}:**")
-                set_df = pd.DataFrame([
-                    {
-                        "Reagent": placement["reagent_code"],
-                        "Location": f"LOC-{placement['location'] + 1}",
-                        "Tests Possible": placement["tests"]
-                    }
-                    for placement in set_info["placements"]
-                ])
-                st.dataframe(set_df, use_container_width=True)
-                st.markdown(f"**Tests from this set:** {set_info['tests_per_set']}")
-                st.markdown("---")
+        st.dataframe(results_df, width="stretch")
+
+    with profile_section("results/details"):
+        st.subheader("Detailed Results")
+        for exp_num, result in config["results"].items():
+            with st.expander(f"{result['name']} (#{exp_num}) - {result['total_tests']} total tests"):
+                for i, set_info in enumerate(result["sets"]):
+                    st.markdown(f"**{'Primary' if i == 0 else 'Additional'} Set {i+1}:**")
+                    set_df = pd.DataFrame([
+                        {
+                            "Reagent": placement["reagent_code"],
+                            "Location": f"LOC-{placement['location'] + 1}",
+                            "Tests Possible": placement["tests"]
+                        }
+                        for placement in set_info["placements"]
+                    ])
+                    st.dataframe(set_df, width="stretch")
+                    st.markdown(f"**Tests from this set:** {set_info['tests_per_set']}")
+                    st.markdown("---")
+
+@st.cache_resource
+def get_optimizer():
+    # CFTRAY_TRAY_VARIANT and CFTRAY_DATA_DIR select the hardware variant
+    optimizer = ReagentOptimizer(cache=ResultCache(path=os.environ.get("CFTRAY_CACHE_PATH")))
+    if os.environ.get("CFTRAY_INDEX_PATH"):
+        optimizer.index = load_index(os.environ["CFTRAY_INDEX_PATH"], optimizer)
+    return optimizer
+
+def display_recommendations(optimizer, selected_experiments):
+    recommendations = optimizer.recommend_subsets(selected_experiments)
+    if not recommendations:
+        return
+    st.subheader("Selections That Fit")
+    st.dataframe(pd.DataFrame([
+        {
+            "Experiments": ", ".join(str(exp) for exp in rec["experiments"]),
+            "Left Out": ", ".join(str(exp) for exp in rec["excluded"]),
+            "Reagents": rec["reagents"],
+            "Tray Life (Tests)": rec["tray_life"]
+        }
+        for rec in recommendations
+    ]), width="stretch")
+
+# How long the background search keeps improving a configuration
+IMPROVEMENT_BUDGET_MS = int(os.environ.get("CFTRAY_IMPROVEMENT_BUDGET_MS", "3000"))
+
+def start_improvement(optimizer, selected_experiments, share_reagents=False):
+    """Optimizes immediately and keeps improving the result in the background."""
+    cancel_improvement()
+    improvement = {
+        "config": None,
+        "cancel": threading.Event(),
+        "deadline": time.monotonic() + IMPROVEMENT_BUDGET_MS / 1000
+    }
+
+    def on_improvement(config):
+        improvement["config"] = TrayConfig.from_dict(config, optimizer.location_capacities)
+
+    config = optimizer.optimize_tray_configuration(
+        selected_experiments,
+        share_reagents=share_reagents,
+        time_budget_ms=IMPROVEMENT_BUDGET_MS,
+        on_improvement=on_improvement,
+        cancel_event=improvement["cancel"]
+    )
+    st.session_state.improvement = improvement
+    return config
+
+def cancel_improvement():
+    improvement = st.session_state.get('improvement')
+    if improvement is not None:
+        improvement["cancel"].set()
+        st.session_state.improvement = None
+
+def improvement_running():
+    improvement = st.session_state.get('improvement')
+    return (improvement is not None
+            and not improvement["cancel"].is_set()
+            and time.monotonic() < improvement["deadline"] + 0.5)
+
+def display_live_results():
+    improvement = st.session_state.get('improvement')
+    if improvement is not None and improvement["config"] is not None:
+        st.session_state.config, improvement["config"] = improvement["config"], None
+
+    if improvement is not None:
+        if improvement_running():
+            st.caption("Searching for a better configuration...")
+        else:
+            # Stop polling: a full rerun re-creates this fragment without run_every
+            st.session_state.improvement = None
+            st.rerun()
+
+    display_results(st.session_state.config.to_dict(), st.session_state.selected_experiments)
 
 def reset_app():
     """Clears all session state variables to reset the app."""
+    cancel_improvement()
     for key in list(st.session_state.keys()):
-        if key.startswith('exp_'):
+        if key.startswith('exp_') or key == 'share_reagents':
             st.session_state[key] = False
         else:
             del st.session_state[key]
 
 def main():
+    if PROFILE:
+        st.session_state._profile = {}
     st.title("🧪 Reagent Tray Configurator")
-    
-    # Initialize session state
-    if 'config' not in st.session_state:
-        st.session_state.config = None
-    if 'selected_experiments' not in st.session_state:
-        st.session_state.selected_experiments = []
-
-    optimizer = ReagentOptimizer()
-    experiments = optimizer.get_available_experiments()
-
-    # Reset Button
-    if st.sidebar.button("Reset All", key="reset_button"):
-        reset_app()
-        st.rerun()
-
-    st.sidebar.header("Available Experiments")
-    selected_experiments = []
-    for exp in experiments:
-        if st.sidebar.checkbox(f"{exp['id']}: {exp['name']}", key=f"exp_{exp['id']}"):
-            selected_experiments.append(exp['id'])
 
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("Or enter experiment numbers manually:")
-    manual_input = st.sidebar.text_input("Experiment numbers (comma-separated)", placeholder="e.g., 1, 16, 29")
+    with profile_section("setup"):
+        # Initialize session state
+        if 'config' not in st.session_state:
+            st.session_state.config = None
+        if 'selected_experiments' not in st.session_state:
+            st.session_state.selected_experiments = []
 
-    if manual_input:
-        selected_experiments = [int(num.strip()) for num in manual_input.split(',') if num.strip()]
+        optimizer = get_optimizer()
+        experiments = optimizer.get_available_experiments()
 
-    optimize_button = st.sidebar.button("Optimize Configuration", key="optimize_button")
+    with profile_section("sidebar"):
+        # Reset Button
+        if st.sidebar.button("Reset All", key="reset_button"):
+            reset_app()
+            st.rerun()
 
-    if optimize_button:
-        if not selected_experiments:
-            st.sidebar.error("Please select at least one experiment")
-        else:
-            try:
-                with st.spinner("Optimizing tray configuration..."):
-                    config = optimizer.optimize_tray_configuration(selected_experiments)
-                st.session_state.config = config
-                st.session_state.selected_experiments = selected_experiments
-            except ValueError as e:
-                st.error(str(e))
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
+        st.sidebar.header("Available Experiments")
+        selected_experiments = []
+        for exp in experiments:
+            if st.sidebar.checkbox(f"{exp['id']}: {exp['name']}", key=f"exp_{exp['id']}"):
+                selected_experiments.append(exp['id'])
+
+        st.sidebar.markdown("---")
+        st.sidebar.markdown("Or enter experiment numbers manually:")
+        manual_input = st.sidebar.text_input("Experiment numbers (comma-separated)", placeholder="e.g., 1, 16, 29")
+
+        if manual_input:
+            selected_experiments = [int(num.strip()) for num in manual_input.split(',') if num.strip()]
+
+        # A search for a selection that is no longer current is wasted work
+        if set(selected_experiments) != set(st.session_state.selected_experiments):
+            cancel_improvement()
+
+        share_reagents = st.sidebar.checkbox(
+            "Pool reagents shared between experiments",
+            key="share_reagents",
+            help="Place a reagent used by several selected experiments once and let them draw from it together"
+        )
+
+        optimize_button = st.sidebar.button("Optimize Configuration", key="optimize_button")
+
+    with profile_section("optimize"):
+        if optimize_button:
+            if not selected_experiments:
+                st.sidebar.error("Please select at least one experiment")
+            else:
+                try:
+                    with st.spinner("Optimizing tray configuration..."):
+                        config = start_improvement(optimizer, selected_experiments, share_reagents)
+                    # Sessions keep the compact form; the dict view is rebuilt to render
+                    st.session_state.config = TrayConfig.from_dict(config, optimizer.location_capacities)
+                    st.session_state.selected_experiments = selected_experiments
+                except CapacityError as e:
+                    st.error(str(e))
+                    display_recommendations(optimizer, e.selected_experiments)
+                except ValueError as e:
+                    st.error(str(e))
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
 
     if st.session_state.config is not None:
-        display_results(st.session_state.config, st.session_state.selected_experiments)
+        # Improvements found by the background search stream in by polling
+        run_every = 0.5 if improvement_running() else None
+        st.fragment(run_every=run_every)(display_live_results)()
 
     st.sidebar.markdown("---")
     st.sidebar.markdown("### How to use")
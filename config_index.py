@@ -0,0 +1,204 @@
+import hashlib
+import mmap
+import os
+import struct
+import warnings
+
+MAGIC = b"CFTIDX1\0"
+HEADER = struct.Struct("<8s16s16s8sHQ")
+EMPTY_SLOT = 0xFFFF
+
+# Slot encoding: bits 8-12 experiment index, 3-7 set index, 0-2 reagent index
+_EXP_SHIFT, _SET_SHIFT = 8, 3
+_MAX_EXPERIMENTS, _MAX_SETS, _MAX_REAGENTS = 32, 32, 8
+
+
+def layout_digest(optimizer):
+    layout = ",".join(str(capacity) for capacity in optimizer.location_capacities)
+    return hashlib.sha256(layout.encode("utf-8")).hexdigest()[:16]
+
+
+def experiment_order(optimizer):
+    """Experiment ids in bit order; bit i of a key is the i-th id."""
+    ids = sorted(optimizer.catalog.records)
+    if len(ids) > _MAX_EXPERIMENTS:
+        raise ValueError(f"The index supports at most {_MAX_EXPERIMENTS} experiments")
+    return ids
+
+
+def selection_key(experiments, positions):
+    key = 0
+    for exp in experiments:
+        key |= 1 << positions[exp]
+    return key
+
+
+def feasible_keys(optimizer, max_experiments=None):
+    """Yield every feasible selection as a bitmask, in ascending order.
+
+    Keys are generated lazily: a selection is followed by its extensions with
+    lower bits, each block in ascending order, so no list or sort is needed.
+    """
+    ids = experiment_order(optimizer)
+    sizes = [optimizer.catalog[exp].num_reagents for exp in ids]
+    limit = max_experiments or len(ids)
+    stack = [(len(ids), 0, 0, 0)]
+    while stack:
+        below, key, used, count = stack.pop()
+        if key:
+            yield key
+        if count == limit:
+            continue
+        # Push higher bits first so the lowest one is expanded next
+        for i in reversed(range(below)):
+            if used + sizes[i] <= optimizer.MAX_LOCATIONS:
+                stack.append((i, key | (1 << i), used + sizes[i], count + 1))
+
+
+def count_feasible_keys(optimizer, max_experiments=None):
+    """Number of keys ``feasible_keys`` yields, counted without generating them."""
+    ids = experiment_order(optimizer)
+    limit = max_experiments or len(ids)
+    ways = {(0, 0): 1}
+    for exp in ids:
+        size = optimizer.catalog[exp].num_reagents
+        for (used, count), n in list(ways.items()):
+            if used + size <= optimizer.MAX_LOCATIONS and count < limit:
+                extended = (used + size, count + 1)
+                ways[extended] = ways.get(extended, 0) + n
+    return sum(ways.values()) - 1
+
+
+def pack_config(config, positions, num_locations):
+    slots = [EMPTY_SLOT] * num_locations
+    for exp_num, result in config["results"].items():
+        if len(result["sets"]) > _MAX_SETS:
+            raise ValueError(f"Experiment {exp_num} has too many sets to index")
+        for set_index, set_info in enumerate(result["sets"]):
+            if len(set_info["placements"]) > _MAX_REAGENTS:
+                raise ValueError(f"Experiment {exp_num} has too many reagents to index")
+            for reagent_index, placement in enumerate(set_info["placements"]):
+                slots[placement["location"]] = (
+                    positions[exp_num] << _EXP_SHIFT | set_index << _SET_SHIFT | reagent_index
+                )
+    return slots
+
+
+class TrayIndex:
+    """Memory-mapped table of precomputed configurations.
+
+    Records are ``(key, slot, slot, ...)`` sorted by the selection bitmask, so
+    a lookup is a binary search over fixed-size records in the mapped file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Index file {path} is empty")
+
+        magic, catalog_version, layout, solver, num_locations, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a tray configuration index")
+        self.catalog_version = catalog_version.decode("ascii")
+        self.layout = layout.decode("ascii")
+        self.solver = solver.rstrip(b"\0").decode("ascii")
+        self.num_locations = num_locations
+        self.count = count
+        self._record = struct.Struct(f"<I{num_locations}H")
+
+    @classmethod
+    def open(cls, path):
+        """Open an index, or return None when the file does not exist."""
+        if not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def compatible_with(self, optimizer):
+        return (self.catalog_version == optimizer.catalog.version
+                and self.layout == layout_digest(optimizer)
+                and self.num_locations == optimizer.MAX_LOCATIONS)
+
+    def lookup_slots(self, key):
+        record = self._record
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            values = record.unpack_from(self._map, HEADER.size + middle * record.size)
+            if values[0] == key:
+                return values[1:]
+            if values[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def lookup(self, optimizer, sorted_experiments):
+        """Rebuild the config for a complexity-sorted, deduplicated selection."""
+        ids = experiment_order(optimizer)
+        positions = {exp: i for i, exp in enumerate(ids)}
+        slots = self.lookup_slots(selection_key(sorted_experiments, positions))
+        if slots is None:
+            return None
+
+        sets = {}
+        for loc, slot in enumerate(slots):
+            if slot == EMPTY_SLOT:
+                continue
+            exp_num = ids[slot >> _EXP_SHIFT]
+            set_index = (slot >> _SET_SHIFT) & (_MAX_SETS - 1)
+            sets.setdefault(exp_num, {}).setdefault(set_index, {})[slot & (_MAX_REAGENTS - 1)] = loc
+
+        config = {
+            "tray_locations": [None] * optimizer.MAX_LOCATIONS,
+            "results": {},
+            "available_locations": set(range(optimizer.MAX_LOCATIONS))
+        }
+        for exp_num in sorted_experiments:
+            for _, reagents in sorted(sets[exp_num].items()):
+                locations = [loc for _, loc in sorted(reagents.items())]
+                optimizer._place_reagent_set(exp_num, locations, config)
+        return config
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+def write_index(path, optimizer, solver, records, count):
+    """Write ``count`` (key, slots) records, which must arrive sorted by key."""
+    record = struct.Struct(f"<I{optimizer.MAX_LOCATIONS}H")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC,
+            optimizer.catalog.version.encode("ascii"),
+            layout_digest(optimizer).encode("ascii"),
+            solver.encode("ascii"),
+            optimizer.MAX_LOCATIONS,
+            count
+        ))
+        written = 0
+        for chunk in records:
+            f.write(b"".join(record.pack(key, *slots) for key, slots in chunk))
+            written += len(chunk)
+    if written != count:
+        os.remove(tmp_path)
+        raise ValueError(f"Expected {count} records, got {written}")
+    os.replace(tmp_path, path)
+
+
+def load_index(path, optimizer):
+    """Open ``path`` for ``optimizer``; None if it is missing or was built for another catalog."""
+    index = TrayIndex.open(path)
+    if index is not None and not index.compatible_with(optimizer):
+        warnings.warn(f"Ignoring stale configuration index {path}")
+        index.close()
+        return None
+    return index
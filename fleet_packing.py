@@ -0,0 +1,145 @@
+from reagent_optimizer import ReagentOptimizer
+from tray_data import load_tray_data
+
+
+class FleetPacker:
+    """Partitions experiment instances across a fleet of trays.
+
+    ``trays`` is a list of tray geometries, each a sequence of per-location
+    capacities in mL. Every tray is optimized by the regular single-tray
+    solver; the packer only decides which experiments go on which tray. An
+    experiment may appear several times in a fleet selection (one instance
+    per analyzer that needs it), but never twice on the same tray.
+    """
+
+    def __init__(self, trays, solver="exact", cache=None):
+        if not trays:
+            raise ValueError("At least one tray geometry is required")
+        self.trays = [tuple(capacities) for capacities in trays]
+        self.solver = solver
+        self._optimizers = {}
+        for geometry in self.trays:
+            if geometry not in self._optimizers:
+                self._optimizers[geometry] = ReagentOptimizer(cache=cache, location_capacities=geometry)
+        self._life_memo = {}
+
+    @classmethod
+    def uniform(cls, count, capacities=None, variant=None, **kwargs):
+        capacities = capacities or load_tray_data(variant).location_capacities
+        return cls([capacities] * count, **kwargs)
+
+    def maximize_fleet_life(self, experiments):
+        """Assign experiments to trays so the worst tray life is as high as possible."""
+        items = self._prepare(experiments)
+
+        # Highest life any instance could reach on a tray of its own
+        upper = min(
+            max(self._tray_life(geometry, (exp,)) or 0 for geometry in self._optimizers)
+            for exp in set(items)
+        )
+        best = self._assign(items, range(len(self.trays)), 1)
+        if best is None:
+            raise ValueError(
+                f"{len(items)} experiment instances do not fit on {len(self.trays)} trays"
+            )
+
+        low, high = 1, upper
+        while low < high:
+            target = (low + high + 1) // 2
+            assignment = self._assign(items, range(len(self.trays)), target)
+            if assignment is None:
+                high = target - 1
+            else:
+                best, low = assignment, target
+        return self._build_plan(best)
+
+    def minimize_trays(self, experiments, target_life):
+        """Use as few trays (taken in list order) as possible while every tray lasts ``target_life`` tests."""
+        items = self._prepare(experiments)
+        assignment = self._assign(items, range(len(self.trays)), target_life)
+        if assignment is None:
+            raise ValueError(
+                f"Cannot reach a tray life of {target_life} tests with {len(self.trays)} trays"
+            )
+        return self._build_plan(assignment)
+
+    def _prepare(self, experiments):
+        if not experiments:
+            raise ValueError("No experiments selected")
+        catalog = next(iter(self._optimizers.values())).catalog
+        for exp in experiments:
+            if exp not in catalog:
+                raise ValueError(f"Invalid experiment number: {exp}")
+        largest = max(len(geometry) for geometry in self._optimizers)
+        for exp in set(experiments):
+            if catalog[exp].num_reagents > largest:
+                raise ValueError(f"Experiment {exp} needs more locations than any tray provides")
+
+        # Place the hardest instances first (first-fit decreasing)
+        return sorted(
+            experiments,
+            key=lambda x: (catalog[x].num_reagents, catalog[x].max_volume, -catalog[x].min_volume, x),
+            reverse=True
+        )
+
+    def _assign(self, items, tray_indices, target_life):
+        trays = list(tray_indices)
+        contents = {index: () for index in trays}
+        used = {index: 0 for index in trays}
+        catalog = next(iter(self._optimizers.values())).catalog
+
+        for exp in items:
+            size = catalog[exp].num_reagents
+            for index in trays:
+                geometry = self.trays[index]
+                if exp in contents[index] or used[index] + size > len(geometry):
+                    continue
+                candidate = tuple(sorted(contents[index] + (exp,)))
+                life = self._tray_life(geometry, candidate)
+                if life is not None and life >= target_life:
+                    contents[index] = candidate
+                    used[index] += size
+                    break
+            else:
+                return None
+        return contents
+
+    def _tray_life(self, geometry, experiments):
+        # Feasibility is judged by the solver that builds the plan, so every
+        # tray it returns really reaches the target life
+        key = (geometry, experiments)
+        if key not in self._life_memo:
+            optimizer = self._optimizers[geometry]
+            if self.solver == "exact":
+                life = optimizer.optimal_tray_life(experiments)
+            else:
+                try:
+                    config = optimizer.optimize_tray_configuration(list(experiments), solver=self.solver)
+                except ValueError:
+                    life = None
+                else:
+                    life = min(result["total_tests"] for result in config["results"].values())
+            self._life_memo[key] = life
+        return self._life_memo[key]
+
+    def _build_plan(self, assignment):
+        trays = []
+        unused = []
+        for index, experiments in sorted(assignment.items()):
+            if not experiments:
+                unused.append(index)
+                continue
+            optimizer = self._optimizers[self.trays[index]]
+            config = optimizer.optimize_tray_configuration(list(experiments), solver=self.solver)
+            trays.append({
+                "tray": index,
+                "location_capacities": list(self.trays[index]),
+                "experiments": list(experiments),
+                "tray_life": min(result["total_tests"] for result in config["results"].values()),
+                "config": config
+            })
+        return {
+            "fleet_life": min(tray["tray_life"] for tray in trays),
+            "trays": trays,
+            "unused_trays": unused
+        }
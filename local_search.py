@@ -0,0 +1,147 @@
+import pickle
+import random
+import threading
+import time
+
+from tray_editor import TrayEditor
+
+
+def _copy_config(config):
+    return pickle.loads(pickle.dumps(config, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _score(config):
+    totals = [result["total_tests"] for result in config["results"].values()]
+    return (min(totals), sum(totals))
+
+
+class ImprovementSearch(threading.Thread):
+    """Improves a tray configuration by local search in a background thread.
+
+    Two moves are tried: swapping the contents of two locations (what a
+    manual swap does) and reassigning a set, i.e. freeing one set of an
+    experiment that has several and giving the locations to the experiment
+    with the fewest tests. A move is kept when it does not lower
+    (tray life, total tests); every strict improvement is published through
+    ``best_config`` and ``on_improvement``. The search stops when the time
+    budget runs out, ``cancel()`` is called, or ``max_stall`` moves in a row
+    fail to improve the score. The cancel event is set once it has stopped,
+    so callers can poll it to see whether the search is still running.
+    """
+
+    def __init__(self, optimizer, config, time_budget_ms, on_improvement=None, cancel_event=None, seed=None,
+                 max_stall=500):
+        super().__init__(daemon=True)
+        self.optimizer = optimizer
+        self.time_budget_ms = time_budget_ms
+        self.max_stall = max_stall
+        self.on_improvement = on_improvement
+        self.improvements = 0
+        self._cancel = cancel_event or threading.Event()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._best = _copy_config(config)
+        self._best_score = _score(config)
+
+    @property
+    def best_config(self):
+        with self._lock:
+            return _copy_config(self._best)
+
+    @property
+    def best_score(self):
+        return self._best_score
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            self._search()
+        finally:
+            self._cancel.set()
+
+    def _search(self):
+        deadline = time.monotonic() + self.time_budget_ms / 1000
+        current = self.best_config
+        editor = TrayEditor(current, self.optimizer)
+        score = self._best_score
+
+        capacities = self.optimizer.location_capacities
+        swap_pairs = [
+            (a, b) for a in range(len(capacities)) for b in range(a + 1, len(capacities))
+            if capacities[a] != capacities[b]
+        ]
+
+        stall = 0
+        while not self._cancel.is_set() and time.monotonic() < deadline and stall < self.max_stall:
+            stall += 1
+            if swap_pairs and self._rng.random() < 0.5:
+                editor.swap(*self._rng.choice(swap_pairs))
+                new_score = _score(current)
+                if new_score < score:
+                    editor.undo()
+                    continue
+            else:
+                candidate = self._reassign_set(current)
+                if candidate is None:
+                    continue
+                new_score = _score(candidate)
+                if new_score < score:
+                    continue
+                current = candidate
+                editor = TrayEditor(current, self.optimizer)
+
+            if new_score > score:
+                stall = 0
+            score = new_score
+            if score > self._best_score:
+                self._publish(current, score)
+
+    def _reassign_set(self, config):
+        results = config["results"]
+        lowest = min(result["total_tests"] for result in results.values())
+        receiver = self._rng.choice([exp for exp, result in results.items() if result["total_tests"] == lowest])
+        record = self.optimizer.catalog[receiver]
+
+        # Pooled sets are shared with another experiment and cannot be freed alone
+        donors = [exp for exp, result in results.items()
+                  if exp != receiver and len(result["sets"]) > 1 and not result.get("shared_with")]
+        enough_free = len(config["available_locations"]) >= record.num_reagents
+        if not donors and not enough_free:
+            return None
+
+        candidate = _copy_config(config)
+        if not enough_free or (donors and self._rng.random() < 0.5):
+            donor = self._rng.choice(donors)
+            sets = candidate["results"][donor]["sets"]
+            self._remove_set(candidate, donor, sets[self._rng.randrange(len(sets))])
+            if len(candidate["available_locations"]) < record.num_reagents:
+                return None
+
+        # Largest free locations go to the largest-volume reagents
+        capacities = self.optimizer.location_capacities
+        free = sorted(candidate["available_locations"], key=lambda loc: (-capacities[loc], loc))
+        self.optimizer._place_reagent_set(receiver, free[:record.num_reagents], candidate)
+        return candidate
+
+    def _remove_set(self, config, exp_num, set_info):
+        result = config["results"][exp_num]
+        result["sets"].remove(set_info)
+        result["total_tests"] -= set_info["tests_per_set"]
+        for placement in set_info["placements"]:
+            config["tray_locations"][placement["location"]] = None
+            config["available_locations"].add(placement["location"])
+
+    def _publish(self, config, score):
+        snapshot = _copy_config(config)
+        with self._lock:
+            self._best = snapshot
+            self._best_score = score
+            self.improvements += 1
+        if self.on_improvement is not None:
+            self.on_improvement(_copy_config(snapshot))
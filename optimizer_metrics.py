@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class OptimizationStats:
+    """Phase timings and counters for a single optimize_tray_configuration call.
+
+    Only created when the optimizer has a metrics callback, so the disabled
+    path never pays for timing.
+    """
+
+    __slots__ = ("solver", "experiments", "phases", "counters", "_last")
+
+    def __init__(self, solver):
+        self.solver = solver
+        self.experiments = ()
+        self.phases = {}
+        self.counters = defaultdict(int)
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        # Attribute the time since the previous mark to ``phase``
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def to_dict(self):
+        return {
+            "solver": self.solver,
+            "experiments": list(self.experiments),
+            "phases": dict(self.phases),
+            "total_seconds": sum(self.phases.values()),
+            "counters": dict(self.counters),
+        }
+
+
+class OptimizerMetrics:
+    """Thread-safe aggregator usable as an optimizer ``on_metrics`` callback."""
+
+    def __init__(self, keep=1024):
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)
+        self._phase_seconds = defaultdict(float)
+        self._counters = defaultdict(int)
+        self._recent = deque(maxlen=keep)
+
+    def __call__(self, stats):
+        with self._lock:
+            self._calls[stats.solver] += 1
+            for phase, seconds in stats.phases.items():
+                self._phase_seconds[(stats.solver, phase)] += seconds
+            for name, value in stats.counters.items():
+                self._counters[(stats.solver, name)] += value
+            self._recent.append(stats.to_dict())
+
+    def summary(self):
+        with self._lock:
+            return {
+                "calls": dict(self._calls),
+                "phase_seconds": {f"{solver}.{phase}": s for (solver, phase), s in self._phase_seconds.items()},
+                "counters": {f"{solver}.{name}": n for (solver, name), n in self._counters.items()},
+            }
+
+    def to_json_lines(self):
+        with self._lock:
+            recent = list(self._recent)
+        return "".join(json.dumps(record) + "\n" for record in recent)
+
+    def to_prometheus(self, prefix="cftray_optimizer"):
+        with self._lock:
+            calls = sorted(self._calls.items())
+            phases = sorted(self._phase_seconds.items())
+            counters = sorted(self._counters.items())
+
+        lines = [f"# TYPE {prefix}_calls_total counter"]
+        lines += [f'{prefix}_calls_total{{solver="{solver}"}} {n}' for solver, n in calls]
+        lines.append(f"# TYPE {prefix}_phase_seconds_total counter")
+        lines += [f'{prefix}_phase_seconds_total{{solver="{solver}",phase="{phase}"}} {s:.9f}'
+                  for (solver, phase), s in phases]
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        lines += [f'{prefix}_events_total{{solver="{solver}",event="{name}"}} {n}'
+                  for (solver, name), n in counters]
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def instrument(optimizer, metrics=None):
+    """Temporarily attach a metrics collector to ``optimizer``.
+
+    The callback is set on the optimizer itself, so calls made from other
+    threads on the same optimizer are collected as well.
+    """
+    metrics = metrics if metrics is not None else OptimizerMetrics()
+    previous = optimizer.on_metrics
+    optimizer.on_metrics = metrics
+    try:
+        yield metrics
+    finally:
+        optimizer.on_metrics = previous
@@ -0,0 +1,295 @@
+import argparse
+import json
+import math
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config_index import load_index
+from optimizer_metrics import OptimizerMetrics
+from reagent_optimizer import ReagentOptimizer
+from result_cache import ResultCache
+from tray_config import TrayConfig
+from tray_editor import TrayEditor
+
+
+def config_to_json(config):
+    return {
+        "tray_locations": config["tray_locations"],
+        "results": {str(exp_num): result for exp_num, result in config["results"].items()},
+        "available_locations": sorted(config["available_locations"]),
+    }
+
+
+def config_from_json(data):
+    return {
+        "tray_locations": data["tray_locations"],
+        "results": {int(exp_num): result for exp_num, result in data["results"].items()},
+        "available_locations": set(data["available_locations"]),
+    }
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_samples)) - 1)
+    return sorted_samples[rank]
+
+
+class LatencyMetrics:
+    """Per-endpoint request counts and a sliding window of latencies."""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {"count": 0, "errors": 0, "samples": deque(maxlen=self.window)}
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["samples"].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: (stats["count"], stats["errors"], sorted(stats["samples"]))
+                         for name, stats in self._endpoints.items()}
+        return {
+            name: {
+                "count": count,
+                "errors": errors,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "max_ms": (samples[-1] if samples else 0.0) * 1000,
+            }
+            for name, (count, errors, samples) in endpoints.items()
+        }
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class OptimizerService:
+    """Request handling shared by every connection of the HTTP server.
+
+    One optimizer (and therefore one compiled catalog and result cache) serves
+    all requests; at most ``max_concurrency`` optimizations run at once and
+    the rest wait up to ``queue_timeout`` seconds before getting a 503.
+    """
+
+    def __init__(self, optimizer=None, max_concurrency=8, queue_timeout=5.0, max_batch=256):
+        self.optimizer = optimizer or ReagentOptimizer(cache=ResultCache(maxsize=4096))
+        self.max_batch = max_batch
+        self.queue_timeout = queue_timeout
+        self.metrics = LatencyMetrics()
+        self.optimizer_metrics = OptimizerMetrics()
+        # Keep a caller's own metrics callback running alongside the service's
+        existing = self.optimizer.on_metrics
+        if existing is None:
+            self.optimizer.on_metrics = self.optimizer_metrics
+        else:
+            def on_metrics(stats):
+                existing(stats)
+                self.optimizer_metrics(stats)
+            self.optimizer.on_metrics = on_metrics
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._catalog_payload = json.dumps(self._catalog()).encode("utf-8")
+
+    def _catalog(self):
+        return {
+            "version": self.optimizer.catalog.version,
+            "variant": self.optimizer.tray_data.variant,
+            "columns": self.optimizer.tray_data.columns,
+            "max_locations": self.optimizer.MAX_LOCATIONS,
+            "location_capacities": list(self.optimizer.location_capacities),
+            "experiments": [
+                {
+                    "id": record.id,
+                    "name": record.name,
+                    "reagents": [{"code": code, "vol": vol} for code, vol in zip(record.codes, record.volumes)],
+                }
+                for record in self.optimizer.catalog.records.values()
+            ],
+        }
+
+    def get(self, path, query=None):
+        if path == "/catalog":
+            return self._catalog_payload
+        if path == "/metrics":
+            if (query or {}).get("format") == ["prometheus"]:
+                return self.optimizer_metrics.to_prometheus()
+            return {
+                "endpoints": self.metrics.snapshot(),
+                "cache": self._cache_stats(),
+                "optimizer": self.optimizer_metrics.summary(),
+            }
+        raise ServiceError(404, f"Unknown endpoint: {path}")
+
+    def post(self, path, body):
+        routes = {
+            "/optimize": self.optimize,
+            "/optimize/batch": self.optimize_batch,
+            "/swap": self.swap,
+        }
+        if path not in routes:
+            raise ServiceError(404, f"Unknown endpoint: {path}")
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ServiceError(503, "Optimizer is at capacity, retry later")
+        try:
+            return routes[path](body)
+        finally:
+            self._slots.release()
+
+    def optimize(self, body):
+        return self._optimize_one(body.get("experiments"), body.get("solver", "greedy"), body.get("format"))
+
+    def optimize_batch(self, body):
+        selections = body.get("selections")
+        if not isinstance(selections, list):
+            raise ServiceError(400, "'selections' must be a list of experiment lists")
+        if len(selections) > self.max_batch:
+            raise ServiceError(400, f"Batch size {len(selections)} exceeds limit of {self.max_batch}")
+
+        solver = body.get("solver", "greedy")
+        results = []
+        for selection in selections:
+            try:
+                results.append(self._optimize_one(selection, solver, body.get("format")))
+            except ServiceError as e:
+                results.append({"error": str(e)})
+        return {"results": results}
+
+    def swap(self, body):
+        try:
+            swaps = body.get("swaps") or [(body["source"], body["target"])]
+            swaps = [(int(source), int(target)) for source, target in swaps]
+            if "v" in body["config"]:
+                tray = TrayConfig.from_json(body["config"])
+                for source, target in swaps:
+                    tray.swap(source, target)
+                return {"config": tray.to_jsonable(), "tray_life": tray.tray_life}
+
+            config = config_from_json(body["config"])
+            editor = TrayEditor(config, self.optimizer)
+            editor.apply_swaps(swaps)
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            raise ServiceError(400, f"Invalid swap request: {e}")
+        return {"config": config_to_json(config), "tray_life": editor.tray_life}
+
+    def _optimize_one(self, experiments, solver, response_format=None):
+        if not isinstance(experiments, list) or not experiments or not all(
+            isinstance(exp, int) and not isinstance(exp, bool) for exp in experiments
+        ):
+            raise ServiceError(400, "'experiments' must be a non-empty list of experiment numbers")
+        try:
+            config = self.optimizer.optimize_tray_configuration(experiments, solver=solver)
+        except ValueError as e:
+            raise ServiceError(400, str(e))
+        tray_life = min(result["total_tests"] for result in config["results"].values())
+        if response_format == "compact":
+            payload = TrayConfig.from_dict(config, self.optimizer.location_capacities).to_jsonable()
+        else:
+            payload = config_to_json(config)
+        return {"config": payload, "tray_life": tray_life}
+
+    def _cache_stats(self):
+        cache = self.optimizer.cache
+        return cache.stats() if cache is not None else None
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self._dispatch(lambda: self.server.service.get(url.path, parse_qs(url.query)))
+
+    def do_POST(self):
+        def handle():
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise ServiceError(400, f"Invalid JSON body: {e}")
+            if not isinstance(body, dict):
+                raise ServiceError(400, "Request body must be a JSON object")
+            return self.server.service.post(urlsplit(self.path).path, body)
+
+        self._dispatch(handle)
+
+    def _dispatch(self, handle):
+        start = time.perf_counter()
+        status = 200
+        try:
+            payload = handle()
+        except ServiceError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"An error occurred: {e}"}
+
+        if isinstance(payload, str):
+            # Prometheus text exposition format
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif isinstance(payload, bytes):
+            body = payload
+            content_type = "application/json"
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.service.metrics.record(urlsplit(self.path).path, time.perf_counter() - start, error=status >= 400)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host="127.0.0.1", port=8000, service=None, verbose=False):
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service or OptimizerService()
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless reagent tray optimization service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--cache-path", help="sqlite file for the persistent result cache")
+    parser.add_argument("--index-path", help="precomputed configuration index built by scripts/build_config_index.py")
+    parser.add_argument("--variant", help="tray hardware variant from data/trays.json")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    optimizer = ReagentOptimizer(cache=ResultCache(maxsize=4096, path=args.cache_path), variant=args.variant)
+    if args.index_path:
+        optimizer.index = load_index(args.index_path, optimizer)
+    service = OptimizerService(optimizer, max_concurrency=args.max_concurrency)
+    server = create_server(args.host, args.port, service, verbose=args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
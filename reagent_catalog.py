@@ -0,0 +1,92 @@
+import hashlib
+import json
+from functools import lru_cache
+from types import MappingProxyType
+
+from tray_data import load_tray_data
+
+
+def _calculate_tests(volume_ul, capacity_ml):
+    return int((capacity_ml * 1000) / volume_ul)
+
+
+class ExperimentRecord:
+    """Immutable, precomputed view of one experiment.
+
+    Reagents are stored in descending volume order, which is the order the
+    optimizer assigns them to locations.
+    """
+
+    __slots__ = ("id", "name", "codes", "volumes", "num_reagents", "max_volume", "min_volume", "tests")
+
+    def __init__(self, exp_id, name, reagents, capacities):
+        ordered = sorted(reagents, key=lambda r: r["vol"], reverse=True)
+        set_ = object.__setattr__
+        set_(self, "id", exp_id)
+        set_(self, "name", name)
+        set_(self, "codes", tuple(r["code"] for r in ordered))
+        set_(self, "volumes", tuple(r["vol"] for r in ordered))
+        set_(self, "num_reagents", len(ordered))
+        set_(self, "max_volume", max(self.volumes))
+        set_(self, "min_volume", min(self.volumes))
+        # tests[capacity][i] is the number of tests reagent i yields in a
+        # location of that capacity
+        set_(self, "tests", MappingProxyType({
+            cap: tuple(_calculate_tests(vol, cap) for vol in self.volumes) for cap in capacities
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class ReagentCatalog:
+    """Compiled experiment catalog shared by every optimizer in the process."""
+
+    __slots__ = ("experiment_data", "capacities", "records", "version")
+
+    def __init__(self, experiment_data, capacities):
+        set_ = object.__setattr__
+        set_(self, "experiment_data", experiment_data)
+        set_(self, "capacities", tuple(capacities))
+        set_(self, "records", MappingProxyType({
+            exp_id: ExperimentRecord(exp_id, exp["name"], exp["reagents"], capacities)
+            for exp_id, exp in experiment_data.items()
+        }))
+        payload = json.dumps([sorted(experiment_data.items()), list(capacities)], sort_keys=True)
+        set_(self, "version", hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def derive(self, experiment_data):
+        """Catalog with extra experiments (e.g. pooled groups) layered on top of this one."""
+        derived = object.__new__(ReagentCatalog)
+        set_ = object.__setattr__
+        records = dict(self.records)
+        records.update({
+            exp_id: ExperimentRecord(exp_id, exp["name"], exp["reagents"], self.capacities)
+            for exp_id, exp in experiment_data.items()
+        })
+        payload = json.dumps(sorted((str(exp_id), exp) for exp_id, exp in experiment_data.items()), sort_keys=True)
+        set_(derived, "experiment_data", {**self.experiment_data, **experiment_data})
+        set_(derived, "capacities", self.capacities)
+        set_(derived, "records", MappingProxyType(records))
+        set_(derived, "version", self.version + "+" + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:8])
+        return derived
+
+    def __contains__(self, exp_id):
+        return exp_id in self.records
+
+    def __getitem__(self, exp_id):
+        return self.records[exp_id]
+
+
+def get_catalog(capacities=None, tray_data=None):
+    """Catalog compiled for ``capacities``, from ``tray_data`` or the configured data files."""
+    tray_data = tray_data or load_tray_data()
+    return _compile_catalog(tray_data, tuple(capacities or tray_data.capacity_classes))
+
+
+@lru_cache(maxsize=None)
+def _compile_catalog(tray_data, capacities):
+    return ReagentCatalog(dict(tray_data.experiment_data), capacities)
@@ -1,66 +1,175 @@
+import copy
 from collections import defaultdict
+from itertools import combinations_with_replacement
+
+from optimizer_metrics import OptimizationStats, instrument
+from reagent_catalog import get_catalog
+from tray_data import load_tray_data
+
+
+class SearchLimitError(ValueError):
+    """Raised when the exact solver's search outgrows ``EXACT_SEARCH_LIMIT``.
+
+    Layouts with many distinct capacities make the exact search exponential;
+    the greedy solver still handles them.
+    """
+
+
+class CapacityError(ValueError):
+    """Raised when a selection needs more locations than the tray has."""
+
+    def __init__(self, message, selected_experiments):
+        super().__init__(message)
+        self.selected_experiments = selected_experiments
+
 
 class ReagentOptimizer:
-    def __init__(self):
-        self.experiment_data = {
-            1: {"name": "Copper (II) (LR)", "reagents": [{"code": "KR1E", "vol": 850}, {"code": "KR1S", "vol": 300}]},
-            2: {"name": "Lead (II) Cadmium (II)", "reagents": [{"code": "KR1E", "vol": 850}, {"code": "KR2S", "vol": 400}]},
-            3: {"name": "Arsenic (III)", "reagents": [{"code": "KR3E", "vol": 850}, {"code": "KR3S", "vol": 400}]},
-            4: {"name": "Nitrates-N (LR)", "reagents": [{"code": "KR4E", "vol": 850}, {"code": "KR4S", "vol": 300}]},
-            5: {"name": "Chromium (VI) (LR)", "reagents": [{"code": "KR5E", "vol": 500}, {"code": "KR5S", "vol": 400}]},
-            6: {"name": "Manganese (II) (LR)", "reagents": [{"code": "KR6E1", "vol": 500}, {"code": "KR6E2", "vol": 500}, {"code": "KR6E3", "vol": 300}]},
-            7: {"name": "Boron (Dissolved)", "reagents": [{"code": "KR7E1", "vol": 1100}, {"code": "KR7E2", "vol": 1860}]},
-            8: {"name": "Silica (Dissolved)", "reagents": [{"code": "KR8E1", "vol": 500}, {"code": "KR8E2", "vol": 1600}]},
-            9: {"name": "Free Chlorine", "reagents": [{"code": "KR9E1", "vol": 1000}, {"code": "KR9E2", "vol": 1000}]},
-            10: {"name": "Total Hardness", "reagents": [{"code": "KR10E1", "vol": 2000}, {"code": "KR10E2", "vol": 2000}, {"code": "KR10E3", "vol": 1600}]},
-            11: {"name": "Total Alkalinity (LR)", "reagents": [{"code": "KR11E", "vol": 2000}]},
-            12: {"name": "Orthophosphates-P (LR)", "reagents": [{"code": "KR12E1", "vol": 500}, {"code": "KR12E2", "vol": 500}, {"code": "KR12E3", "vol": 200}]},
-            13: {"name": "Mercury (II)", "reagents": [{"code": "KR13E1", "vol": 850}, {"code": "KR13S", "vol": 300}]},
-            14: {"name": "Selenium (IV)", "reagents": [{"code": "KR14E", "vol": 500}, {"code": "KR14S", "vol": 300}]},
-            15: {"name": "Zinc (II) (LR)", "reagents": [{"code": "KR15E", "vol": 850}, {"code": "KR15S", "vol": 400}]},
-            16: {"name": "Iron (Dissolved)", "reagents": [{"code": "KR16E1", "vol": 1000}, {"code": "KR16E2", "vol": 1000}, {"code": "KR16E3", "vol": 1000}, {"code": "KR16E4", "vol": 1000}]},
-            17: {"name": "Residual Chlorine", "reagents": [{"code": "KR17E1", "vol": 1000}, {"code": "KR17E2", "vol": 1000}]},
-            18: {"name": "Zinc (HR)", "reagents": [{"code": "KR18E1", "vol": 1000}, {"code": "KR18E2", "vol": 1000}]},
-            19: {"name": "Manganese  (HR)", "reagents": [{"code": "KR19E1", "vol": 1000}, {"code": "KR19E2", "vol": 1000}, {"code": "KR19E3", "vol": 1000}]},
-            20: {"name": "Orthophosphates-P (HR) ", "reagents": [{"code": "KR20E", "vol": 1600}]},
-            21: {"name": "Total Alkalinity (HR)", "reagents": [{"code": "KR21E1", "vol": 2000}]},
-            22: {"name": "Fluoride", "reagents": [{"code": "KR22E1", "vol": 1000},{"code": "KR22E2", "vol": 1000}]},
-            27: {"name": "Molybdenum", "reagents": [{"code": "KR27E1", "vol": 1000}, {"code": "KR27E2", "vol": 1000}]},
-            28: {"name": "Nitrates-N (HR)", "reagents": [{"code": "KR28E1", "vol": 1000}, {"code": "KR28E2", "vol": 2000}, {"code": "KR28E3", "vol": 2000}]},
-            29: {"name": "Total Ammonia-N", "reagents": [{"code": "KR29E1", "vol": 850}, {"code": "KR29E2", "vol": 850}, {"code": "KR29E3", "vol": 850}]},
-            30: {"name": "Chromium (HR)", "reagents": [{"code": "KR30E1", "vol": 1000},{"code": "KR30E2", "vol": 1000}, {"code": "KR30E3", "vol": 1000}]},
-            31: {"name": "Nitrite-N", "reagents": [{"code": "KR31E1", "vol": 1000}, {"code": "KR31E2", "vol": 1000}]},
-            34: {"name": "Nickel (HR)", "reagents": [{"code": "KR34E1", "vol": 500}, {"code": "KR34E2", "vol": 500}]},
-            35: {"name": "Copper (II) (HR)", "reagents": [{"code": "KR35E1", "vol": 1000}, {"code": "KR35E2", "vol": 1000}]},
-            36: {"name": "Sulfate", "reagents": [{"code": "KR36E1", "vol": 1000}, {"code": "KR36E2", "vol": 2300}]},
-            40: {"name": "Potassium", "reagents": [{"code": "KR40E1", "vol": 2000}, {"code": "KR40E2", "vol": 1000}]},
-            42: {"name": "Aluminum-BB", "reagents": [{"code": "KR42E1", "vol": 1000}, {"code": "KR42E2", "vol": 1000}]}
-        }
+    # Bundle checks the exact solver may make per search before giving up
+    EXACT_SEARCH_LIMIT = 20_000_000
+
+    def __init__(self, cache=None, location_capacities=None, on_metrics=None, index=None, variant=None):
+        # Geometry and catalog come from the data files; an explicit
+        # location_capacities overrides the variant's layout
+        self.tray_data = load_tray_data(variant)
+        self.location_capacities = tuple(location_capacities or self.tray_data.location_capacities)
+        self.MAX_LOCATIONS = len(self.location_capacities)
 
-        self.MAX_LOCATIONS = 16
+        self.catalog = get_catalog(tuple(sorted(set(self.location_capacities), reverse=True)), self.tray_data)
+        self.experiment_data = self.catalog.experiment_data
+        self.cache = cache
+        self.on_metrics = on_metrics
+        self.index = index
+
+        # Locations with the same capacity are interchangeable, so the exact
+        # solver only tracks how many of each capacity class are still free.
+        self._class_capacities = self.catalog.capacities
+        self._class_locations = {cap: [] for cap in self._class_capacities}
+        for loc, capacity in enumerate(self.location_capacities):
+            self._class_locations[capacity].append(loc)
+        self._class_free = tuple(len(self._class_locations[cap]) for cap in self._class_capacities)
+        # Per-class counts are packed into one int, one field per class with
+        # a guard bit on top. A packed count ``remaining`` starts with every
+        # guard set; subtracting a usage clears a guard exactly when that
+        # class runs out, so fitting is a single subtraction and mask test.
+        # The guard exceeds any usage count (at most MAX_LOCATIONS), so even
+        # an overfull class never borrows from its neighbour.
+        self._class_width = self.MAX_LOCATIONS.bit_length() + 1
+        guard = 1 << (self._class_width - 1)
+        self._class_guards = sum(guard << (c * self._class_width) for c in range(len(self._class_free)))
+        self._class_remaining = self._class_guards + self._pack(self._class_free)
+        self._largest_locations = tuple(self._class_locations[self._class_capacities[0]])
+        self._bundle_memo = {}
+
+    def _pack(self, counts):
+        return sum(count << (c * self._class_width) for c, count in enumerate(counts))
 
     def calculate_tests(self, volume_ul, capacity_ml):
         return int((capacity_ml * 1000) / volume_ul)
 
     def get_location_capacity(self, location):
-        return 270 if location < 4 else 140
+        return self.location_capacities[location]
+
+    def instrument(self, metrics=None):
+        return instrument(self, metrics)
+
+    def optimize_tray_configuration(self, selected_experiments, solver="greedy", share_reagents=False,
+                                    time_budget_ms=None, on_improvement=None, cancel_event=None):
+        """Optimize a tray for the selected experiments.
+
+        With ``time_budget_ms`` the solver result is returned immediately and a
+        background local search keeps improving a copy of it for up to that
+        long, passing each better config to ``on_improvement``. Setting
+        ``cancel_event`` stops the search early; the search sets it itself
+        once it finishes. The exact solver's result is already optimal, so no
+        search is started for it and ``cancel_event`` is set right away.
+
+        With ``share_reagents`` a reagent code used by several selected
+        experiments may be placed once as a common pool (see _solve_shared).
+        """
+        config = self._optimize(selected_experiments, solver, share_reagents)
+        if time_budget_ms is not None and solver == "exact":
+            if cancel_event is not None:
+                cancel_event.set()
+        elif time_budget_ms is not None:
+            # local_search builds on this module, so it is imported lazily
+            from local_search import ImprovementSearch
+            ImprovementSearch(self, config, time_budget_ms, on_improvement, cancel_event).start()
+        return config
+
+    def _optimize(self, selected_experiments, solver, share_reagents=False):
+        if solver not in ("greedy", "exact"):
+            raise ValueError(f"Unknown solver: {solver}")
+
+        catalog = self.catalog
+        on_metrics = self.on_metrics
+        stats = None if on_metrics is None else OptimizationStats(solver)
 
-    def optimize_tray_configuration(self, selected_experiments):
         # Validate experiments
         for exp in selected_experiments:
-            if exp not in self.experiment_data:
+            if exp not in catalog:
                 raise ValueError(f"Invalid experiment number: {exp}")
 
+        # Order and duplicates in the selection do not change the problem
+        selected_experiments = sorted(set(selected_experiments))
+
+        groups = self._shared_reagent_groups(selected_experiments) if share_reagents else []
+
         # Check total reagents needed
-        total_reagents = sum(len(self.experiment_data[exp]["reagents"]) for exp in selected_experiments)
+        total_reagents = sum(catalog[exp].num_reagents for exp in selected_experiments)
+        for members in groups:
+            # A pooled code takes one location however many experiments use it
+            codes = [code for exp in members for code in catalog[exp].codes]
+            total_reagents -= len(codes) - len(set(codes))
         if total_reagents > self.MAX_LOCATIONS:
-            details = [f"{self.experiment_data[exp]['name']}: {len(self.experiment_data[exp]['reagents'])} reagents" 
+            details = [f"{catalog[exp].name}: {catalog[exp].num_reagents} reagents"
                       for exp in selected_experiments]
-            raise ValueError(
+            raise CapacityError(
                 f"Total reagents needed ({total_reagents}) exceeds available locations ({self.MAX_LOCATIONS}).\n"
-                f"Experiment requirements:\n" + "\n".join(details)
+                f"Experiment requirements:\n" + "\n".join(details),
+                selected_experiments
             )
 
+        if stats is None:
+            return self._solve_cached(selected_experiments, solver, groups=groups)
+
+        stats.experiments = selected_experiments
+        stats.mark("validation")
+        config = self._solve_cached(selected_experiments, solver, stats, groups)
+        on_metrics(stats)
+        return config
+
+    def _solve_cached(self, selected_experiments, solver, stats=None, groups=()):
+        index = self.index
+        if index is not None and index.solver == solver and not groups:
+            config = index.lookup(self, self._sort_by_complexity(selected_experiments))
+            if stats is not None:
+                stats.counters["index_hits" if config is not None else "index_misses"] += 1
+                stats.mark("index_lookup")
+            if config is not None:
+                return config
+
+        if self.cache is None:
+            return self._solve(selected_experiments, solver, stats, groups)
+
+        key = self._cache_key(selected_experiments, solver + ("+shared" if groups else ""))
+        config = self.cache.get(key)
+        if stats is not None:
+            stats.counters["cache_hits" if config is not None else "cache_misses"] += 1
+            stats.mark("cache_lookup")
+        if config is None:
+            config = self._solve(selected_experiments, solver, stats, groups)
+            self.cache.put(key, config)
+        return config
+
+    def _cache_key(self, selected_experiments, solver):
+        layout = ",".join(str(capacity) for capacity in self.location_capacities)
+        experiments = ",".join(str(exp) for exp in selected_experiments)
+        return f"{self.catalog.version}|{layout}|{solver}|{experiments}"
+
+    def _solve(self, selected_experiments, solver, stats=None, groups=()):
+        if groups:
+            return self._solve_shared(selected_experiments, solver, groups, stats)
+
         # Initialize configuration
         config = {
             "tray_locations": [None] * self.MAX_LOCATIONS,
@@ -69,56 +178,403 @@ class ReagentOptimizer:
         }
 
         # Sort experiments by complexity and volume requirements
-        sorted_experiments = sorted(
-            selected_experiments,
-            key=lambda x: (
-                len(self.experiment_data[x]["reagents"]),
-                max(r["vol"] for r in self.experiment_data[x]["reagents"]),
-                -min(r["vol"] for r in self.experiment_data[x]["reagents"])  # Prioritize experiments with smaller min volumes
-            ),
-            reverse=True
-        )
+        sorted_experiments = self._sort_by_complexity(selected_experiments)
+        if stats is not None:
+            stats.mark("sorting")
+
+        if solver == "exact":
+            self._place_exact_configuration(sorted_experiments, config)
+            if stats is not None:
+                stats.mark("exact_search")
+            return config
 
         # Phase 1: Place primary sets
         for exp in sorted_experiments:
-            self._place_primary_set(exp, config)
+            self._place_primary_set(exp, config, stats)
+        if stats is not None:
+            stats.mark("primary_sets")
 
         # Phase 2: Optimize additional sets
-        self._optimize_additional_sets(sorted_experiments, config)
+        self._optimize_additional_sets(sorted_experiments, config, stats)
+        if stats is not None:
+            stats.mark("additional_sets")
+
+        return config
+
+    def _shared_reagent_groups(self, experiments):
+        # Experiments linked through any common reagent code, as sorted tuples
+        owner = {}
+        parent = {exp: exp for exp in experiments}
+
+        def find(exp):
+            while parent[exp] != exp:
+                parent[exp] = parent[parent[exp]]
+                exp = parent[exp]
+            return exp
+
+        for exp in experiments:
+            for code in self.catalog[exp].codes:
+                if code in owner:
+                    parent[find(exp)] = find(owner[code])
+                else:
+                    owner[code] = exp
+
+        groups = defaultdict(list)
+        for exp in experiments:
+            groups[find(exp)].append(exp)
+        return [tuple(sorted(members)) for members in groups.values() if len(members) > 1]
+
+    def _solve_shared(self, selected_experiments, solver, groups, stats=None):
+        """Solve with each group of reagent-sharing experiments placed as one unit.
+
+        A group behaves like a single experiment whose reagents are the union
+        of its members' codes; a shared code consumes the members' combined
+        volume per test cycle. The solver then places group sets like any
+        other, so the locations saved by pooling go to additional sets.
+        Because a pool drains faster than separate bottles, the unpooled
+        solution is kept when it gives the better tray.
+        """
+        pooled_data = {}
+        members_of = {}
+        for members in groups:
+            volumes = {}
+            for exp in members:
+                record = self.catalog[exp]
+                for code, vol in zip(record.codes, record.volumes):
+                    volumes[code] = volumes.get(code, 0) + vol
+            group_id = "+".join(str(exp) for exp in members)
+            pooled_data[group_id] = {
+                "name": " + ".join(self.catalog[exp].name for exp in members),
+                "reagents": [{"code": code, "vol": vol} for code, vol in volumes.items()]
+            }
+            members_of[group_id] = members
+
+        pooled = copy.copy(self)
+        pooled.catalog = self.catalog.derive(pooled_data)
+        pooled.cache = pooled.index = pooled.on_metrics = None
+
+        grouped = {exp for members in groups for exp in members}
+        units = [exp for exp in selected_experiments if exp not in grouped] + list(pooled_data)
+        config = self._expand_pooled(pooled._solve(units, solver, stats), members_of)
+
+        if sum(self.catalog[exp].num_reagents for exp in selected_experiments) <= self.MAX_LOCATIONS:
+            separate = self._solve(selected_experiments, solver, stats)
+            if self._config_score(separate) >= self._config_score(config):
+                return separate
+        return config
+
+    def _expand_pooled(self, config, members_of):
+        # Give each member experiment its own view of its group's sets
+        results = {}
+        for unit, result in config["results"].items():
+            if unit not in members_of:
+                results[unit] = result
+                continue
+            for exp in members_of[unit]:
+                record = self.catalog[exp]
+                sets = []
+                for set_info in result["sets"]:
+                    placements = [p for p in set_info["placements"] if p["reagent_code"] in record.codes]
+                    sets.append({
+                        "placements": placements,
+                        "tests_per_set": min(p["tests"] for p in placements)
+                    })
+                results[exp] = {
+                    "name": record.name,
+                    "sets": sets,
+                    "total_tests": sum(set_info["tests_per_set"] for set_info in sets),
+                    "shared_with": [other for other in members_of[unit] if other != exp]
+                }
 
+        for entry in config["tray_locations"]:
+            if entry is not None and entry["experiment"] in members_of:
+                users = [exp for exp in members_of[entry["experiment"]]
+                         if entry["reagent_code"] in self.catalog[exp].codes]
+                entry["experiment"] = users[0]
+                if len(users) > 1:
+                    entry["shared_by"] = users
+
+        config["results"] = results
         return config
 
-    def _place_primary_set(self, exp, config):
-        exp_data = self.experiment_data[exp]
-        num_reagents = len(exp_data["reagents"])
-        
-        # Try to place high-volume reagents in 270mL locations first
-        high_volume_reagents = any(r["vol"] > 800 for r in exp_data["reagents"])
-        if high_volume_reagents:
-            available_270 = [loc for loc in range(4) if loc in config["available_locations"]]
+    def _config_score(self, config):
+        totals = [result["total_tests"] for result in config["results"].values()]
+        return (min(totals), sum(totals))
+
+    def _sort_by_complexity(self, experiments):
+        catalog = self.catalog
+        return sorted(
+            experiments,
+            key=lambda x: (
+                catalog[x].num_reagents,
+                catalog[x].max_volume,
+                -catalog[x].min_volume  # Prioritize experiments with smaller min volumes
+            ),
+            reverse=True
+        )
+
+    def optimal_tray_life(self, selected_experiments):
+        """Best achievable tray life for a selection, without building a config.
+
+        Returns None when the selection does not fit on the tray.
+        """
+        experiments = self._sort_by_complexity(set(selected_experiments))
+        if sum(self.catalog[exp].num_reagents for exp in experiments) > self.MAX_LOCATIONS:
+            return None
+        tray_life, _ = self._exact_tray_life(experiments)
+        return tray_life if tray_life >= 0 else None
+
+    def recommend_subsets(self, selected_experiments, priorities=None, top_k=5):
+        """Rank feasible subsets of an over-capacity selection.
+
+        Subsets are ranked by total priority (``priorities`` maps experiment
+        to weight, default 1) and then by optimal tray life. A top-N knapsack
+        over reagent counts keeps only the best candidates for each number of
+        used locations instead of enumerating every combination.
+        """
+        for exp in selected_experiments:
+            if exp not in self.catalog:
+                raise ValueError(f"Invalid experiment number: {exp}")
+        priorities = priorities or {}
+        experiments = self._sort_by_complexity(set(selected_experiments))
+
+        # Enough candidates per weight that ties on priority can still be
+        # separated by tray life
+        keep = max(4 * top_k, 16)
+
+        # Ties on priority are broken by a cheap tray life bound: with ``used``
+        # locations taken, no experiment beats its best set in the largest
+        # locations repeated over every spare location.
+        largest = self._class_capacities[0]
+
+        def life_bound(used, subset):
+            spare = self.MAX_LOCATIONS - used
+            return min(
+                (1 + spare // self.catalog[exp].num_reagents) * min(self.catalog[exp].tests[largest])
+                for exp in subset
+            ) if subset else 0
+
+        states = {0: [(0, ())]}
+        for exp in experiments:
+            size = self.catalog[exp].num_reagents
+            value = priorities.get(exp, 1)
+            updated = {used: list(candidates) for used, candidates in states.items()}
+            for used, candidates in states.items():
+                if used + size > self.MAX_LOCATIONS:
+                    continue
+                updated.setdefault(used + size, []).extend(
+                    (priority + value, subset + (exp,)) for priority, subset in candidates
+                )
+            states = {
+                used: sorted(candidates, key=lambda c: (c[0], life_bound(used, c[1])), reverse=True)[:keep]
+                for used, candidates in updated.items()
+            }
+
+        candidates = sorted(
+            ((candidate, life_bound(used, candidate[1]))
+             for used, group in states.items() if used > 0 for candidate in group),
+            key=lambda c: (c[0][0], c[1]),
+            reverse=True
+        )[:keep]
+
+        ranked = []
+        for (priority, subset), _ in candidates:
+            tray_life = self.optimal_tray_life(subset)
+            if tray_life is None:
+                continue
+            ranked.append({
+                "experiments": sorted(subset),
+                "excluded": sorted(set(experiments) - set(subset)),
+                "priority": priority,
+                "reagents": sum(self.catalog[exp].num_reagents for exp in subset),
+                "tray_life": tray_life
+            })
+        ranked.sort(key=lambda r: (r["priority"], r["tray_life"]), reverse=True)
+        return ranked[:top_k]
+
+    def _exact_tray_life(self, experiments):
+        # Every other experiment still needs a primary set, which bounds how
+        # many locations a single experiment's sets may take.
+        spare = self.MAX_LOCATIONS - sum(self.catalog[exp].num_reagents for exp in experiments)
+        bundles = [self._exact_bundles(exp, spare) for exp in experiments]
+        guards = self._class_guards
+        last = len(experiments)
+        life_memo = {}
+        budget = self._search_budget()
+
+        def best_life(i, remaining):
+            # Highest achievable min(total_tests) over experiments[i:]
+            if i == last:
+                return float('inf')
+            key = (i, remaining)
+            if key in life_memo:
+                return life_memo[key]
+            best = -1
+            for checked, (usage, total, _) in enumerate(bundles[i]):
+                if total <= best:
+                    break  # bundles are sorted by total, nothing below can win
+                rest = remaining - usage
+                if rest & guards == guards:
+                    best = max(best, min(total, best_life(i + 1, rest)))
+            budget(checked)
+            life_memo[key] = best
+            return best
+
+        return best_life(0, self._class_remaining), bundles
+
+    def _place_exact_configuration(self, experiments, config):
+        tray_life, bundles = self._exact_tray_life(experiments)
+        if tray_life < 0:
+            raise ValueError("Could not find suitable locations for the selected experiments")
+        guards = self._class_guards
+        last = len(experiments)
+
+        # No experiment can total more than its best bundle
+        bound = [0] * (last + 1)
+        for i in reversed(range(last)):
+            bound[i] = bound[i + 1] + bundles[i][0][1]
+        sum_memo = {}
+        budget = self._search_budget()
+
+        def best_sum(i, remaining):
+            # Highest sum of total_tests over experiments[i:] keeping each >= tray_life
+            if i == last:
+                return 0, None
+            key = (i, remaining)
+            if key in sum_memo:
+                return sum_memo[key]
+            best = (-1, None)
+            for index, (usage, total, _) in enumerate(bundles[i]):
+                if total < tray_life or total + bound[i + 1] <= best[0]:
+                    break
+                rest = remaining - usage
+                if rest & guards == guards:
+                    rest_total, _ = best_sum(i + 1, rest)
+                    if rest_total >= 0 and total + rest_total > best[0]:
+                        best = (total + rest_total, index)
+            budget(index)
+            sum_memo[key] = best
+            return best
+
+        remaining = self._class_remaining
+        capacities = self._class_capacities
+        pools = {cap: list(locs) for cap, locs in self._class_locations.items()}
+        for i, exp in enumerate(experiments):
+            _, index = best_sum(i, remaining)
+            usage, _, sets = bundles[i][index]
+            remaining -= usage
+            for set_classes, _ in sorted(sets, key=lambda s: s[1], reverse=True):
+                locations = [pools[capacities[c]].pop(0) for c in set_classes]
+                self._place_reagent_set(exp, locations, config)
+
+    def _search_budget(self):
+        remaining = self.EXACT_SEARCH_LIMIT
+
+        def spend(checked):
+            nonlocal remaining
+            remaining -= checked + 1
+            if remaining < 0:
+                raise SearchLimitError(
+                    f"Exact search exceeded {self.EXACT_SEARCH_LIMIT} bundle checks on a layout with "
+                    f"{len(self._class_capacities)} capacity classes; use solver=\"greedy\" for this layout"
+                )
+        return spend
+
+    def _exact_bundles(self, exp, spare):
+        key = (exp, spare)
+        if key not in self._bundle_memo:
+            self._bundle_memo[key] = self._enumerate_bundles(exp, spare)
+        return self._bundle_memo[key]
+
+    def _enumerate_bundles(self, exp, spare):
+        """Best total for every packed class usage one experiment's sets can take.
+
+        Returns ``(usage, total, sets)`` tuples sorted by descending total.
+        """
+        record = self.catalog[exp]
+        capacities = self._class_capacities
+        guards = self._class_guards
+        free = self._class_remaining
+        num_classes = len(capacities)
+        max_sets = (record.num_reagents + spare) // record.num_reagents
+
+        # A set assigns one capacity class per reagent. Pairing the largest
+        # volumes with the largest capacities is optimal for a min(), so only
+        # class multisets need to be enumerated, not permutations.
+        set_options = []
+        for classes in combinations_with_replacement(range(num_classes), record.num_reagents):
+            counts = [0] * num_classes
+            for c in classes:
+                counts[c] += 1
+            usage = self._pack(counts)
+            if (free - usage) & guards != guards:
+                continue
+            tests = min(record.tests[capacities[c]][i] for i, c in enumerate(classes))
+            set_options.append((usage, tests, classes))
+
+        # Every set takes num_reagents locations, so bundles of n sets form
+        # layer n of a DP over usage vectors:
+        #     best[u] = max(best[u - option.usage] + option.tests)
+        # which visits each distinct usage once instead of every multiset of sets.
+        best = {}
+        layer = {0: 0}
+        for _ in range(max_sets):
+            next_layer = {}
+            for usage, total in layer.items():
+                for set_usage, tests, classes in set_options:
+                    new_usage = usage + set_usage
+                    if (free - new_usage) & guards != guards:
+                        continue
+                    entry = next_layer.get(new_usage)
+                    if entry is None or entry[0] < total + tests:
+                        next_layer[new_usage] = (total + tests, usage, (classes, tests))
+            best.update(next_layer)
+            layer = {usage: entry[0] for usage, entry in next_layer.items()}
+
+        bundles = []
+        for usage, (total, _, _) in best.items():
+            sets = []
+            node = usage
+            while node:
+                _, node, set_info = best[node]
+                sets.append(set_info)
+            bundles.append((usage, total, tuple(sets)))
+        bundles.sort(key=lambda b: (b[1], -len(b[2])), reverse=True)
+        return bundles
+
+    def _place_primary_set(self, exp, config, stats=None):
+        record = self.catalog[exp]
+        num_reagents = record.num_reagents
+
+        # Try to place high-volume reagents in the largest locations first
+        if record.max_volume > 800:
+            available_270 = [loc for loc in self._largest_locations if loc in config["available_locations"]]
             if len(available_270) >= num_reagents:
                 self._place_reagent_set(exp, available_270[:num_reagents], config)
+                if stats is not None:
+                    stats.counters["large_location_placements"] += 1
                 return
 
         # Otherwise, find best available locations
         available_locs = sorted(config["available_locations"])
         best_locations = []
-        
+        capacities = self.location_capacities
+
         # Find optimal locations based on reagent volumes
-        for reagent in sorted(exp_data["reagents"], key=lambda r: r["vol"], reverse=True):
+        for i in range(num_reagents):
             best_loc = None
             best_efficiency = 0
-            
+            if stats is not None:
+                stats.counters["candidate_locations"] += len(available_locs)
+
             for loc in available_locs:
-                if loc not in best_locations:
-                    capacity = self.get_location_capacity(loc)
-                    tests = self.calculate_tests(reagent["vol"], capacity)
-                    efficiency = tests / capacity
-                    
-                    if efficiency > best_efficiency:
-                        best_efficiency = efficiency
-                        best_loc = loc
-            
+                capacity = capacities[loc]
+                efficiency = record.tests[capacity][i] / capacity
+
+                if efficiency > best_efficiency:
+                    best_efficiency = efficiency
+                    best_loc = loc
+
             if best_loc is not None:
                 best_locations.append(best_loc)
                 available_locs.remove(best_loc)
@@ -128,77 +584,75 @@ class ReagentOptimizer:
         else:
             raise ValueError(f"Could not find suitable locations for experiment {exp}")
 
-    def _optimize_additional_sets(self, experiments, config):
+    def _optimize_additional_sets(self, experiments, config, stats=None):
+        results = config["results"]
         while config["available_locations"]:
             # Find experiment with lowest tests
             min_tests_exp = min(
                 experiments,
-                key=lambda x: config["results"][x]["total_tests"] if x in config["results"] else float('inf')
+                key=lambda x: results[x]["total_tests"] if x in results else float('inf')
             )
-            
+
             # Check if additional set would improve total tests
-            exp_data = self.experiment_data[min_tests_exp]
-            num_reagents = len(exp_data["reagents"])
-            
+            record = self.catalog[min_tests_exp]
+            num_reagents = record.num_reagents
+
             if len(config["available_locations"]) >= num_reagents:
                 # Calculate potential improvement
                 available = sorted(config["available_locations"])
-                potential_tests = float('inf')
-                
-                for reagent in exp_data["reagents"]:
-                    loc = available[0]
-                    capacity = self.get_location_capacity(loc)
-                    tests = self.calculate_tests(reagent["vol"], capacity)
-                    potential_tests = min(potential_tests, tests)
-                
-                current_tests = config["results"][min_tests_exp]["total_tests"]
-                
+                potential_tests = min(record.tests[self.location_capacities[available[0]]])
+
+                current_tests = results[min_tests_exp]["total_tests"]
+
                 # Only place additional set if it improves total tests significantly
                 if potential_tests > current_tests * 0.5:
-                    locations = sorted(list(config["available_locations"]))[:num_reagents]
-                    self._place_reagent_set(min_tests_exp, locations, config)
+                    self._place_reagent_set(min_tests_exp, available[:num_reagents], config)
+                    if stats is not None:
+                        stats.counters["additional_sets"] += 1
                 else:
                     # If no significant improvement, stop adding sets
+                    if stats is not None:
+                        stats.counters["early_exits"] += 1
                     break
             else:
                 break
 
     def _place_reagent_set(self, exp_num, locations, config):
-        exp = self.experiment_data[exp_num]
-        sorted_reagents = sorted(exp["reagents"], key=lambda r: r["vol"], reverse=True)
+        record = self.catalog[exp_num]
         placements = []
 
-        for i, reagent in enumerate(sorted_reagents):
+        for i, code in enumerate(record.codes):
             loc = locations[i]
-            capacity = self.get_location_capacity(loc)
-            tests = self.calculate_tests(reagent["vol"], capacity)
-            
+            capacity = self.location_capacities[loc]
+            tests = record.tests[capacity][i]
+            volume = record.volumes[i]
+
             placement = {
-                "reagent_code": reagent["code"],
+                "reagent_code": code,
                 "location": loc,
                 "tests": tests,
-                "volume": reagent["vol"]
+                "volume": volume
             }
             placements.append(placement)
-            
+
             config["tray_locations"][loc] = {
-                "reagent_code": reagent["code"],
+                "reagent_code": code,
                 "experiment": exp_num,
                 "tests_possible": tests,
-                "volume_per_test": reagent["vol"],
+                "volume_per_test": volume,
                 "capacity": capacity
             }
             config["available_locations"].remove(loc)
 
         set_tests = min(p["tests"] for p in placements)
-        
+
         if exp_num not in config["results"]:
             config["results"][exp_num] = {
-                "name": exp["name"],
+                "name": record.name,
                 "sets": [],
                 "total_tests": 0
             }
-        
+
         config["results"][exp_num]["sets"].append({
             "placements": placements,
             "tests_per_set": set_tests
@@ -206,7 +660,7 @@ class ReagentOptimizer:
         config["results"][exp_num]["total_tests"] += set_tests
 
     def get_available_experiments(self):
-        return [{"id": id_, "name": exp["name"]} 
-                for id_, exp in self.experiment_data.items()]
+        return [{"id": id_, "name": record.name}
+                for id_, record in self.catalog.records.items()]
 
 
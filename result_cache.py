@@ -0,0 +1,83 @@
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Two-tier cache of optimized tray configurations.
+
+    Entries are stored pickled, so every hit returns an independent copy that
+    callers (e.g. the manual swap logic) are free to mutate. The in-process
+    tier is an LRU; the optional sqlite tier at ``path`` survives restarts.
+    """
+
+    def __init__(self, maxsize=256, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, config BLOB NOT NULL)")
+            self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(blob)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT config FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return pickle.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, key, config):
+        blob = pickle.dumps(config, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, blob)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO results (key, config) VALUES (?, ?)", (key, blob))
+                self._db.commit()
+
+    def _remember(self, key, blob):
+        self._entries[key] = blob
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
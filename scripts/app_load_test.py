@@ -0,0 +1,226 @@
+"""Drive simulated Streamlit sessions through app.py and report rerun latency.
+
+Each session is a headless ``AppTest`` that repeats a user cycle: tick a
+few experiment checkboxes, optimize, look at the details, reset. Sessions
+run in separate worker processes: ``AppTest.run()`` swaps process-global
+Streamlit state, so sessions cannot safely share one interpreter, and
+processes also keep the GIL from serializing them. Each process warms its
+own cached resources, which shows up in its "load" step:
+
+    python scripts/app_load_test.py --sessions 8 --cycles 5 --target-ms 300
+
+The app is run with CFTRAY_PROFILE=1 so every rerun also reports how long
+its setup, sidebar, optimize and results sections took. A second, serial
+pass with tracemalloc measures how much memory each session keeps alive.
+Pass --improvement-budget-ms 0 to keep the background search from
+competing with reruns.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from optimizer_service import percentile  # noqa: E402
+from reagent_optimizer import ReagentOptimizer  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "app.py")
+
+
+def random_selection(rng, optimizer, max_experiments):
+    """A feasible selection of up to ``max_experiments`` experiments."""
+    ids = list(optimizer.catalog.records)
+    rng.shuffle(ids)
+    selection, used = [], 0
+    for exp in ids:
+        size = optimizer.catalog[exp].num_reagents
+        if used + size <= optimizer.MAX_LOCATIONS:
+            selection.append(exp)
+            used += size
+        if len(selection) == max_experiments:
+            break
+    return selection
+
+
+class Session:
+    """One simulated user. Records ``(step, seconds, sections)`` per rerun."""
+
+    def __init__(self, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.samples = []
+        self._rerun("load", self.app.run)
+
+    def _rerun(self, step, action):
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+        if self.app.exception:
+            raise RuntimeError(f"{step}: {self.app.exception[0].value}")
+        sections = dict(self.app.session_state["_profile"]) if "_profile" in self.app.session_state else {}
+        self.samples.append((step, elapsed, sections))
+
+    def cycle(self, selection):
+        for exp in selection:
+            self._rerun("select", self.app.sidebar.checkbox(key=f"exp_{exp}").check().run)
+        self._rerun("optimize", self.app.sidebar.button(key="optimize_button").click().run)
+        if not self.app.metric:
+            raise RuntimeError(f"optimize produced no result for {selection}")
+        # Expanders open client-side without a rerun; the next rerun (any
+        # widget change or the live-results poll) re-renders all details
+        self._rerun("details", self.app.run)
+        self._rerun("reset", self.app.sidebar.button(key="reset_button").click().run)
+
+
+def _run_session(selections, timeout):
+    """Worker process: run one session and return its samples and wall-clock span."""
+    start = time.time()
+    session = None
+    try:
+        session = Session(timeout)
+        for selection in selections:
+            session.cycle(selection)
+        error = None
+    except Exception as e:
+        error = str(e)
+    samples = session.samples if session is not None else []
+    return samples, error, start, time.time()
+
+
+def run_sessions(count, cycles, max_experiments, seed, timeout):
+    optimizer = ReagentOptimizer()
+    selections = [
+        [random_selection(random.Random(seed * 1000003 + i * 1009 + c), optimizer, max_experiments)
+         for c in range(cycles)]
+        for i in range(count)
+    ]
+    with ProcessPoolExecutor(max_workers=count) as pool:
+        results = list(pool.map(_run_session, selections, [timeout] * count))
+
+    samples = [sample for session_samples, _, _, _ in results for sample in session_samples]
+    errors = [f"session {i}: {error}" for i, (_, error, _, _) in enumerate(results) if error]
+    # Sessions overlap; the run lasts from the first start to the last finish
+    elapsed = max(end for _, _, _, end in results) - min(start for _, _, start, _ in results)
+    return samples, errors, elapsed
+
+
+def measure_memory(count, max_experiments, seed, timeout):
+    """Traced bytes each session keeps alive while it holds a result."""
+    optimizer = ReagentOptimizer()
+    rng = random.Random(seed)
+
+    # The first session pays for imports and shared caches
+    warm = Session(timeout)
+    warm.cycle(random_selection(rng, optimizer, max_experiments))
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for _ in range(count):
+        session = Session(timeout)
+        for exp in random_selection(rng, optimizer, max_experiments):
+            session.app.sidebar.checkbox(key=f"exp_{exp}").check()
+        session.app.sidebar.button(key="optimize_button").click().run()
+        sessions.append(session)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "sessions": count,
+        "per_session_kb": (current - baseline) / count / 1024,
+        "peak_kb": (peak - baseline) / 1024,
+    }
+
+
+def summarize(samples, target_ms):
+    by_step = defaultdict(list)
+    sections = defaultdict(lambda: defaultdict(list))
+    for step, elapsed, timings in samples:
+        by_step[step].append(elapsed * 1000)
+        for name, seconds in timings.items():
+            sections[step][name].append(seconds * 1000)
+
+    def stats(values):
+        values.sort()
+        return {
+            "count": len(values),
+            "mean_ms": sum(values) / len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "max_ms": values[-1],
+        }
+
+    report = {}
+    for step, values in by_step.items():
+        report[step] = stats(values)
+        if target_ms is not None:
+            report[step]["over_target"] = sum(value > target_ms for value in values)
+        report[step]["sections"] = {name: stats(v) for name, v in sections[step].items()}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rerun latency and memory load test for app.py")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent simulated sessions")
+    parser.add_argument("--cycles", type=int, default=3, help="select/optimize/details/reset cycles per session")
+    parser.add_argument("--max-experiments", type=int, default=4, help="experiments ticked per cycle")
+    parser.add_argument("--target-ms", type=float, help="response-time target; reruns above it are counted")
+    parser.add_argument("--improvement-budget-ms", type=int,
+                        help="background search budget for the app (CFTRAY_IMPROVEMENT_BUDGET_MS)")
+    parser.add_argument("--memory-sessions", type=int, default=8,
+                        help="sessions for the tracemalloc pass; 0 skips it")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    os.environ["CFTRAY_PROFILE"] = "1"
+    if args.improvement_budget_ms is not None:
+        os.environ["CFTRAY_IMPROVEMENT_BUDGET_MS"] = str(args.improvement_budget_ms)
+
+    samples, errors, elapsed = run_sessions(
+        args.sessions, args.cycles, args.max_experiments, args.seed, args.timeout
+    )
+    report = {
+        "sessions": args.sessions,
+        "cycles": args.cycles,
+        "reruns": len(samples),
+        "elapsed_s": elapsed,
+        "reruns_per_s": len(samples) / elapsed if elapsed else 0.0,
+        "target_ms": args.target_ms,
+        "errors": errors,
+        "steps": summarize(samples, args.target_ms),
+    }
+    if args.memory_sessions:
+        report["memory"] = measure_memory(args.memory_sessions, args.max_experiments, args.seed, args.timeout)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['reruns']} reruns across {args.sessions} sessions in {elapsed:.2f}s "
+              f"({report['reruns_per_s']:.1f} reruns/s)")
+        for step, stats in report["steps"].items():
+            over = f" over_target={stats['over_target']}" if "over_target" in stats else ""
+            print(f"  {step:<9} n={stats['count']:<5} p50={stats['p50_ms']:.1f}ms "
+                  f"p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms{over}")
+            for name, section in stats["sections"].items():
+                print(f"    {name:<17} p50={section['p50_ms']:.2f}ms p95={section['p95_ms']:.2f}ms")
+        if "memory" in report:
+            memory = report["memory"]
+            print(f"  memory: {memory['per_session_kb']:.0f} KiB retained per session, "
+                  f"peak {memory['peak_kb']:.0f} KiB over {memory['sessions']} sessions")
+        for error in errors:
+            print(f"  error: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Benchmark optimize_tray_configuration latency and solution quality.
+
+Selections are generated reproducibly from the catalog: every feasible
+selection up to --exhaustive-size experiments plus --samples random feasible
+selections drawn with --seed. For each solver mode the report contains
+latency percentiles, throughput, peak traced memory, and achieved tray life
+relative to an upper bound. Each solver runs on a fresh optimizer, so the
+latency includes the exact solver's bundle enumeration the first time each
+experiment needs it.
+
+    python scripts/benchmark_optimizer.py --output bench.json
+    python scripts/benchmark_optimizer.py --baseline bench.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from optimizer_service import percentile  # noqa: E402
+from reagent_optimizer import ReagentOptimizer  # noqa: E402
+
+SOLVERS = ("greedy", "exact")
+
+
+def exhaustive_selections(optimizer, max_size):
+    catalog = optimizer.catalog
+    ids = sorted(catalog.records)
+    for size in range(1, max_size + 1):
+        for selection in itertools.combinations(ids, size):
+            if sum(catalog[exp].num_reagents for exp in selection) <= optimizer.MAX_LOCATIONS:
+                yield list(selection)
+
+
+def random_selections(optimizer, count, seed):
+    catalog = optimizer.catalog
+    ids = sorted(catalog.records)
+    rng = random.Random(seed)
+    selections = []
+    while len(selections) < count:
+        rng.shuffle(ids)
+        selection = []
+        used = 0
+        target = rng.randint(1, optimizer.MAX_LOCATIONS)
+        for exp in ids:
+            if used + catalog[exp].num_reagents <= optimizer.MAX_LOCATIONS:
+                selection.append(exp)
+                used += catalog[exp].num_reagents
+            if len(selection) == target:
+                break
+        selections.append(sorted(selection))
+    return selections
+
+
+def tray_life_upper_bound(optimizer, selection):
+    # Relaxation: each experiment may use every location the others do not
+    # need for their primary sets, including all of the largest ones.
+    spare = optimizer.MAX_LOCATIONS - sum(optimizer.catalog[exp].num_reagents for exp in selection)
+    return min(
+        max(total for _, total, _ in optimizer._exact_bundles(exp, spare))
+        for exp in selection
+    )
+
+
+def tray_life(config):
+    return min(result["total_tests"] for result in config["results"].values())
+
+
+def benchmark_solver(optimizer, solver, selections, bounds, repeat):
+    latencies = []
+    ratios = []
+    below_bound = 0
+    start = time.perf_counter()
+    for selection, bound in zip(selections, bounds):
+        for _ in range(repeat):
+            call_start = time.perf_counter()
+            config = optimizer.optimize_tray_configuration(selection, solver=solver)
+            latencies.append(time.perf_counter() - call_start)
+        life = tray_life(config)
+        ratios.append(life / bound)
+        below_bound += life < bound
+    wall = time.perf_counter() - start
+
+    tracemalloc.start()
+    for selection in selections:
+        optimizer.optimize_tray_configuration(selection, solver=solver)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) * 1000,
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "throughput_per_s": len(latencies) / wall,
+        "peak_memory_kib": peak / 1024,
+        "quality": {
+            "mean_ratio_to_bound": sum(ratios) / len(ratios),
+            "min_ratio_to_bound": min(ratios),
+            "selections_below_bound": below_bound,
+        },
+    }
+
+
+def compare(report, baseline):
+    lines = []
+    for solver, current in report["solvers"].items():
+        previous = baseline.get("solvers", {}).get(solver)
+        if previous is None:
+            continue
+        for section, metric in (("latency_ms", "p50"), ("latency_ms", "p99"),
+                                ("quality", "mean_ratio_to_bound"), ("quality", "min_ratio_to_bound")):
+            old = previous[section][metric]
+            new = current[section][metric]
+            change = (new - old) / old * 100 if old else 0.0
+            lines.append(f"{solver:<7} {section}.{metric:<20} {old:10.4f} -> {new:10.4f} ({change:+.1f}%)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--solver", action="append", choices=SOLVERS, help="solver(s) to run; default all")
+    parser.add_argument("--exhaustive-size", type=int, default=2,
+                        help="include every feasible selection with up to this many experiments")
+    parser.add_argument("--samples", type=int, default=500, help="number of random feasible selections")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="timed calls per selection")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report from a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    optimizer = ReagentOptimizer()
+    selections = list(exhaustive_selections(optimizer, args.exhaustive_size))
+    selections += random_selections(optimizer, args.samples, args.seed)
+    # The bound shares the exact solver's bundle enumeration, so it runs on a
+    # separate optimizer and every solver starts from a cold bundle memo
+    bound_optimizer = ReagentOptimizer()
+    bounds = [tray_life_upper_bound(bound_optimizer, selection) for selection in selections]
+
+    report = {
+        "python": platform.python_version(),
+        "catalog_version": optimizer.catalog.version,
+        "selections": {
+            "count": len(selections),
+            "exhaustive_size": args.exhaustive_size,
+            "samples": args.samples,
+            "seed": args.seed,
+        },
+        "solvers": {
+            solver: benchmark_solver(ReagentOptimizer(), solver, selections, bounds, args.repeat)
+            for solver in (args.solver or SOLVERS)
+        },
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
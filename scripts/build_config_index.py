@@ -0,0 +1,92 @@
+"""Precompute the configuration of every feasible selection into a binary index.
+
+    python scripts/build_config_index.py --output tray_index.bin --solver exact
+
+Selections are generated lazily in key order, solved in parallel across
+--workers processes and written as they complete, so memory use is bounded by
+the in-flight chunks. Point the app or service at the file with
+``load_index`` to answer lookups from it.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config_index import (  # noqa: E402
+    count_feasible_keys, experiment_order, feasible_keys, pack_config, write_index
+)
+from reagent_optimizer import ReagentOptimizer  # noqa: E402
+
+_worker = {}
+
+
+def _init_worker(solver):
+    optimizer = ReagentOptimizer()
+    _worker["optimizer"] = optimizer
+    _worker["solver"] = solver
+    _worker["ids"] = experiment_order(optimizer)
+    _worker["positions"] = {exp: i for i, exp in enumerate(_worker["ids"])}
+
+
+def _solve_chunk(keys):
+    optimizer = _worker["optimizer"]
+    ids = _worker["ids"]
+    records = []
+    for key in keys:
+        selection = [exp for i, exp in enumerate(ids) if key >> i & 1]
+        config = optimizer.optimize_tray_configuration(selection, solver=_worker["solver"])
+        records.append((key, pack_config(config, _worker["positions"], optimizer.MAX_LOCATIONS)))
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--solver", choices=("greedy", "exact"), default="exact")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--max-experiments", type=int,
+                        help="only index selections with up to this many experiments")
+    args = parser.parse_args(argv)
+
+    optimizer = ReagentOptimizer()
+    total = count_feasible_keys(optimizer, args.max_experiments)
+    keys = feasible_keys(optimizer, args.max_experiments)
+    chunks = iter(lambda: list(islice(keys, args.chunk_size)), [])
+    print(f"Indexing {total} selections with {args.workers} workers", file=sys.stderr)
+
+    start = time.perf_counter()
+
+    def solve_in_order(pool):
+        # Pool.imap would queue every chunk up front; keep a few per worker
+        # in flight and hand results back in key order instead
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_solve_chunk, (chunk,)))
+            if len(pending) >= 2 * args.workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def progress(results):
+        done = 0
+        for chunk in results:
+            done += len(chunk)
+            print(f"\r{done}/{total} ({time.perf_counter() - start:.0f}s)", end="", file=sys.stderr)
+            yield chunk
+        print(file=sys.stderr)
+
+    with Pool(args.workers, initializer=_init_worker, initargs=(args.solver,)) as pool:
+        write_index(args.output, optimizer, args.solver, progress(solve_in_order(pool)), total)
+
+    size = os.path.getsize(args.output)
+    print(f"Wrote {args.output} ({size / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
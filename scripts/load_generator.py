@@ -0,0 +1,168 @@
+"""Drive the optimization service with concurrent clients and report latency.
+
+By default an in-process server is started on a free local port, so the
+whole run needs nothing but this repository:
+
+    python scripts/load_generator.py --clients 16 --requests 2000
+
+Pass --url to target an already running service instead.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from optimizer_service import OptimizerService, create_server, percentile  # noqa: E402
+
+
+def random_selection(rng, catalog, max_locations):
+    experiments = list(catalog)
+    rng.shuffle(experiments)
+    selection = []
+    used = 0
+    target = rng.randint(1, 6)
+    for exp in experiments:
+        size = len(exp["reagents"])
+        if used + size <= max_locations:
+            selection.append(exp["id"])
+            used += size
+        if len(selection) == target:
+            break
+    return selection
+
+
+def build_request(rng, catalog, max_locations, mix, solver):
+    kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+    if kind == "batch":
+        selections = [random_selection(rng, catalog, max_locations) for _ in range(8)]
+        return "/optimize/batch", {"selections": selections, "solver": solver}
+    return "/optimize", {"experiments": random_selection(rng, catalog, max_locations), "solver": solver}
+
+
+def post(url, path, payload):
+    request = urllib.request.Request(
+        url + path,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def get(url, path):
+    with urllib.request.urlopen(url + path, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def run_client(url, catalog, max_locations, args, seed, counter, latencies, errors, lock):
+    rng = random.Random(seed)
+    while True:
+        with lock:
+            if counter[0] >= args.requests:
+                return
+            counter[0] += 1
+
+        path, payload = build_request(rng, catalog, max_locations, {"single": 0.8, "batch": 0.2}, args.solver)
+        start = time.perf_counter()
+        try:
+            result = post(url, path, payload)
+            if path == "/optimize" and rng.random() < args.swap_ratio:
+                locations = rng.sample(range(max_locations), 2)
+                post(url, "/swap", {"config": result["config"], "swaps": [locations]})
+                path = "/optimize+swap"
+        except (urllib.error.URLError, OSError) as e:
+            with lock:
+                errors.append(f"{path}: {e}")
+            continue
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(path, []).append(elapsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running service; defaults to an in-process server")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--solver", choices=("greedy", "exact"), default="greedy")
+    parser.add_argument("--swap-ratio", type=float, default=0.1, help="fraction of /optimize calls followed by a /swap")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        server = create_server(port=0, service=OptimizerService(max_concurrency=args.max_concurrency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+    url = url.rstrip("/")
+
+    catalog = get(url, "/catalog")
+    experiments = catalog["experiments"]
+    max_locations = catalog["max_locations"]
+
+    latencies = {}
+    errors = []
+    counter = [0]
+    lock = threading.Lock()
+    start = time.perf_counter()
+    clients = [
+        threading.Thread(
+            target=run_client,
+            args=(url, experiments, max_locations, args, args.seed + i, counter, latencies, errors, lock),
+        )
+        for i in range(args.clients)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    wall = time.perf_counter() - start
+
+    completed = sum(len(samples) for samples in latencies.values())
+    report = {
+        "clients": args.clients,
+        "requests": completed,
+        "errors": len(errors),
+        "wall_s": wall,
+        "throughput_rps": completed / wall if wall else 0.0,
+        "client_latency": {
+            path: {
+                "count": len(samples),
+                "p50_ms": percentile(sorted(samples), 50) * 1000,
+                "p95_ms": percentile(sorted(samples), 95) * 1000,
+                "p99_ms": percentile(sorted(samples), 99) * 1000,
+            }
+            for path, samples in sorted(latencies.items())
+        },
+        "server_metrics": get(url, "/metrics"),
+    }
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{completed} requests from {args.clients} clients in {wall:.2f}s "
+              f"({report['throughput_rps']:.0f} req/s, {len(errors)} errors)")
+        for path, stats in report["client_latency"].items():
+            print(f"  {path:<16} n={stats['count']:<6} p50={stats['p50_ms']:.2f}ms "
+                  f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+        for line in errors[:5]:
+            print(f"  error: {line}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import json
+import random
+
+import pytest
+
+from reagent_optimizer import ReagentOptimizer, SearchLimitError
+
+LAYOUTS = [
+    (270, 270, 140, 140, 140, 140),
+    (270, 200, 200, 140, 140, 100),
+    (300, 270, 200, 140, 100, 80, 60),
+]
+SMALL_EXPERIMENTS = [1, 5, 7, 9, 11, 14, 20, 21, 34, 36, 40]
+
+
+def brute_force(optimizer, experiments):
+    """Best (tray life, total tests) over every assignment of reagents to locations."""
+    capacities = optimizer.location_capacities
+    records = {exp: optimizer.catalog[exp] for exp in experiments}
+    sets = {exp: [] for exp in experiments}
+    best = [(-1, -1)]
+
+    def missing():
+        return sum(records[exp].num_reagents - len(s) for exp in experiments for s in sets[exp])
+
+    def visit(loc):
+        if missing() > len(capacities) - loc:
+            return
+        if loc == len(capacities):
+            if all(sets[exp] for exp in experiments):
+                totals = [
+                    sum(min(records[exp].tests[capacities[l]][i] for i, l in s.items()) for s in sets[exp])
+                    for exp in experiments
+                ]
+                best[0] = max(best[0], (min(totals), sum(totals)))
+            return
+        visit(loc + 1)
+        for exp in experiments:
+            for i in range(records[exp].num_reagents):
+                for s in sets[exp]:
+                    if i not in s and len(s) < records[exp].num_reagents:
+                        s[i] = loc
+                        visit(loc + 1)
+                        del s[i]
+                sets[exp].append({i: loc})
+                visit(loc + 1)
+                sets[exp].pop()
+
+    visit(0)
+    return best[0]
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_exact_matches_brute_force(layout):
+    optimizer = ReagentOptimizer(location_capacities=layout)
+    rng = random.Random(sum(layout))
+    for _ in range(25):
+        experiments = rng.sample(SMALL_EXPERIMENTS, rng.randint(1, 3))
+        if sum(optimizer.catalog[exp].num_reagents for exp in experiments) > len(layout):
+            continue
+        config = optimizer.optimize_tray_configuration(experiments, solver="exact")
+        totals = [result["total_tests"] for result in config["results"].values()]
+        assert sorted(config["results"]) == sorted(experiments)
+        assert (min(totals), sum(totals)) == brute_force(optimizer, experiments)
+        assert optimizer.optimal_tray_life(experiments) == min(totals)
+
+        placed = [p["location"] for result in config["results"].values()
+                  for s in result["sets"] for p in s["placements"]]
+        assert len(placed) == len(set(placed))
+
+
+def test_distinct_capacities_stay_tractable():
+    layout = tuple(range(300, 140, -10))
+    optimizer = ReagentOptimizer(location_capacities=layout)
+    config = optimizer.optimize_tray_configuration([9], solver="exact")
+    # Both reagents take 1000 uL, so the best pairing matches neighbouring capacities
+    assert config["results"][9]["total_tests"] == sum(layout[1::2])
+
+    optimizer.EXACT_SEARCH_LIMIT = 1000
+    with pytest.raises(SearchLimitError):
+        optimizer.optimize_tray_configuration([1, 16, 29], solver="exact")
+
+
+def test_usage_beyond_free_count_does_not_overflow_packed_fields(tmp_path, monkeypatch):
+    # Eight single-location classes, but a set needs six of them: a usage
+    # count can exceed the free count of its class without spilling into
+    # the neighbouring field
+    layout = [300, 290, 280, 270, 260, 250, 240, 230]
+    reagents = [{"code": f"R{i}", "vol": 1000 - 100 * i} for i in range(6)]
+    (tmp_path / "trays.json").write_text(json.dumps({
+        "format": 1, "default": "wide", "variants": {"wide": {"location_capacities": layout}}
+    }))
+    (tmp_path / "experiments.json").write_text(json.dumps({
+        "format": 1, "experiments": {"1": {"name": "Six reagents", "reagents": reagents}}
+    }))
+    (tmp_path / "colors.json").write_text(json.dumps({"format": 1, "colors": {}}))
+    monkeypatch.setenv("CFTRAY_DATA_DIR", str(tmp_path))
+
+    optimizer = ReagentOptimizer()
+    config = optimizer.optimize_tray_configuration([1], solver="exact")
+    assert (config["results"][1]["total_tests"],) * 2 == brute_force(optimizer, [1])
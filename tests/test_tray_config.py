@@ -0,0 +1,36 @@
+import json
+
+from reagent_optimizer import ReagentOptimizer
+from tray_config import TrayConfig
+
+
+def test_pooled_volumes_and_long_names_round_trip(tmp_path, monkeypatch):
+    # Two 40 mL draws pooled into one location exceed 16 bits, and names
+    # and codes longer than 255 bytes exceed 8-bit length fields
+    name = "Long experiment name " * 15
+    code = "SHARED" + "X" * 300
+    (tmp_path / "trays.json").write_text(json.dumps({
+        "format": 1, "default": "big",
+        "variants": {"big": {"location_capacities": [500, 500, 500, 500, 500]}}
+    }))
+    (tmp_path / "experiments.json").write_text(json.dumps({
+        "format": 1,
+        "experiments": {
+            "1": {"name": name, "reagents": [{"code": code, "vol": 40000}, {"code": "A", "vol": 1000}]},
+            "2": {"name": "Second", "reagents": [{"code": code, "vol": 40000}, {"code": "B", "vol": 1000}]},
+            "3": {"name": "Third", "reagents": [{"code": "C", "vol": 1000}, {"code": "D", "vol": 1000}]},
+        }
+    }))
+    (tmp_path / "colors.json").write_text(json.dumps({"format": 1, "colors": {}}))
+    monkeypatch.setenv("CFTRAY_DATA_DIR", str(tmp_path))
+
+    optimizer = ReagentOptimizer()
+    # Six reagents only fit on five locations when the shared code is pooled
+    config = optimizer.optimize_tray_configuration([1, 2, 3], share_reagents=True)
+    assert any(entry and entry.get("shared_by") for entry in config["tray_locations"])
+
+    tray = TrayConfig.from_dict(config, optimizer.location_capacities)
+    expected = tray.to_dict()
+    assert max(tray.volume) > 0xFFFF
+    assert TrayConfig.from_bytes(tray.to_bytes()).to_dict() == expected
+    assert TrayConfig.from_json(tray.to_json()).to_dict() == expected
@@ -0,0 +1,101 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from reagent_optimizer import ReagentOptimizer  # noqa: E402
+from tray_simulator import DepletionSimulator  # noqa: E402
+
+
+def reference_simulation(configs, times, experiments, trays=None, until=None):
+    """Replay events one at a time, drawing from each experiment's active set."""
+    served, requested, runout = {}, {}, {}
+    remaining = {
+        (tray, loc): entry["capacity"] * 1000
+        for tray, config in enumerate(configs)
+        for loc, entry in enumerate(config["tray_locations"]) if entry is not None
+    }
+    for i in sorted(range(len(times)), key=lambda i: times[i]):
+        if until is not None and times[i] > until:
+            continue
+        for tray in ([trays[i]] if trays is not None else range(len(configs))):
+            result = configs[tray]["results"].get(experiments[i])
+            if result is None:
+                continue
+            key = (tray, experiments[i])
+            requested[key] = requested.get(key, 0) + 1
+            done = served.get(key, 0)
+            if done >= result["total_tests"]:
+                runout.setdefault(key, times[i])
+                continue
+            for set_info in result["sets"]:
+                if done < set_info["tests_per_set"]:
+                    break
+                done -= set_info["tests_per_set"]
+            for placement in set_info["placements"]:
+                loc = placement["location"]
+                users = len(configs[tray]["tray_locations"][loc].get("shared_by", ())) or 1
+                remaining[(tray, loc)] -= placement["volume"] / users
+            served[key] = served.get(key, 0) + 1
+    return served, requested, runout, remaining
+
+
+def assert_matches_reference(configs, times, experiments, trays=None, until=None):
+    result = DepletionSimulator(configs).simulate(times, experiments, trays=trays, until=until)
+    served, requested, runout, remaining = reference_simulation(configs, times, experiments, trays, until)
+
+    for pair, (tray, exp) in enumerate(zip(result.pair_tray.tolist(), result.pair_experiment.tolist())):
+        assert result.tests_served[pair] == served.get((tray, exp), 0)
+        assert result.tests_requested[pair] == requested.get((tray, exp), 0)
+        assert result.runout_time[pair] == runout.get((tray, exp), math.inf)
+    for tray in range(len(configs)):
+        expected = min((time for (t, _), time in runout.items() if t == tray), default=math.inf)
+        assert result.tray_runout_time[tray] == expected
+    for slot, (tray, loc) in enumerate(zip(result.slot_tray.tolist(), result.slot_location.tolist())):
+        assert result.remaining_ul[slot] == pytest.approx(remaining[(tray, loc)])
+
+
+def random_events(configs, count, seed):
+    rng = random.Random(seed)
+    hosted = sorted({exp for config in configs for exp in config["results"]})
+    # A few events for an experiment no tray hosts must be ignored
+    choices = hosted + [hosted[0] + 1000]
+    times = [rng.uniform(0, 100) for _ in range(count)]
+    experiments = [rng.choice(choices) for _ in range(count)]
+    trays = [rng.randrange(len(configs)) for _ in range(count)]
+    return times, experiments, trays
+
+
+@pytest.fixture(scope="module")
+def configs():
+    optimizer = ReagentOptimizer()
+    return [
+        optimizer.optimize_tray_configuration([1, 7, 11, 16], solver="exact"),
+        optimizer.optimize_tray_configuration([7, 9, 11]),
+        # 17 reagents only fit with KR1E pooled between experiments 1 and 2
+        optimizer.optimize_tray_configuration([1, 2, 3, 4, 5, 6, 13, 15], share_reagents=True),
+    ]
+
+
+def test_pooled_config_has_shared_location(configs):
+    assert any(entry and entry.get("shared_by") for entry in configs[2]["tray_locations"])
+
+
+@pytest.mark.parametrize("count", [50, 3000])
+def test_shared_schedule_matches_reference(configs, count):
+    times, experiments, _ = random_events(configs, count, count)
+    assert_matches_reference(configs, times, experiments)
+
+
+@pytest.mark.parametrize("count", [50, 9000])
+def test_per_tray_events_match_reference(configs, count):
+    times, experiments, trays = random_events(configs, count, count + 1)
+    assert_matches_reference(configs, times, experiments, trays=trays)
+
+
+def test_until_matches_reference(configs):
+    times, experiments, trays = random_events(configs, 9000, 7)
+    assert_matches_reference(configs, times, experiments, until=60.0)
+    assert_matches_reference(configs, times, experiments, trays=trays, until=60.0)
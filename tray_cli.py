@@ -0,0 +1,195 @@
+"""Headless tray optimization.
+
+    python -m tray_cli optimize 1 16 29 --solver exact
+    python -m tray_cli batch orders.jsonl --output configs.jsonl --workers 8
+
+Batch input is JSONL (each line a list of experiment numbers or an object
+with "experiments" and an optional "id") or CSV with an "experiments" column
+(numbers separated by spaces, commas or semicolons) and an optional "id"
+column. Results are written as JSON lines in completion order, each tagged
+with its input line number. Only the optimizer core is imported, so the
+command starts without loading the UI stack.
+"""
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+
+from reagent_optimizer import ReagentOptimizer
+from tray_config import TrayConfig
+from tray_data import DataFileError, load_tray_data
+
+_worker = {}
+
+
+def parse_experiments(value):
+    if isinstance(value, list):
+        return [int(exp) for exp in value]
+    return [int(exp) for exp in re.split(r"[\s,;]+", str(value).strip()) if exp]
+
+
+def read_orders(stream, input_format):
+    """Yield ``(line_number, order_id, experiments)``; bad lines yield the error instead."""
+    if input_format == "csv":
+        for line_number, row in enumerate(csv.DictReader(stream), start=2):
+            try:
+                yield line_number, row.get("id"), parse_experiments(row["experiments"])
+            except (KeyError, ValueError) as e:
+                yield line_number, row.get("id"), e
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                yield line_number, record.get("id"), parse_experiments(record["experiments"])
+            else:
+                yield line_number, None, parse_experiments(record)
+        except (KeyError, TypeError, ValueError) as e:
+            yield line_number, None, e
+
+
+def _init_worker(solver, share_reagents, compact, variant=None):
+    _worker.update(optimizer=ReagentOptimizer(variant=variant), solver=solver, share_reagents=share_reagents, compact=compact)
+
+
+def _optimize_chunk(orders):
+    return [_optimize_order(*order) for order in orders]
+
+
+def _optimize_order(line_number, order_id, experiments):
+    result = {"line": line_number, "id": order_id}
+    if isinstance(experiments, Exception):
+        result["error"] = f"Invalid input: {experiments}"
+        return result
+
+    optimizer = _worker["optimizer"]
+    result["experiments"] = experiments
+    try:
+        config = optimizer.optimize_tray_configuration(
+            experiments, solver=_worker["solver"], share_reagents=_worker["share_reagents"]
+        )
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+
+    result["tray_life"] = min(r["total_tests"] for r in config["results"].values())
+    if _worker["compact"]:
+        result["config"] = TrayConfig.from_dict(config, optimizer.location_capacities).to_jsonable()
+    else:
+        result["config"] = {
+            "tray_locations": config["tray_locations"],
+            "results": {str(exp): r for exp, r in config["results"].items()},
+            "available_locations": sorted(config["available_locations"]),
+        }
+    return result
+
+
+def _chunks(orders, size):
+    chunk = []
+    for order in orders:
+        chunk.append(order)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(orders, output, workers, chunk_size, solver, share_reagents, compact, variant=None):
+    """Optimize ``orders`` and write each result line as soon as it is ready.
+
+    At most ``2 * workers`` chunks are in flight, so memory stays bounded
+    regardless of input size. Returns ``(written, failed)``.
+    """
+    written = failed = 0
+
+    def emit(results):
+        nonlocal written, failed
+        for result in results:
+            output.write(json.dumps(result, separators=(",", ":")) + "\n")
+            written += 1
+            failed += "error" in result
+
+    initargs = (solver, share_reagents, compact, variant)
+    if workers <= 1:
+        _init_worker(*initargs)
+        for chunk in _chunks(orders, chunk_size):
+            emit(_optimize_chunk(chunk))
+        return written, failed
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+        pending = set()
+        for chunk in _chunks(orders, chunk_size):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    emit(future.result())
+            pending.add(pool.submit(_optimize_chunk, chunk))
+        for future in pending:
+            emit(future.result())
+    return written, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tray_cli", description="Headless tray optimization")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command):
+        command.add_argument("--solver", choices=("greedy", "exact"), default="greedy")
+        command.add_argument("--share-reagents", action="store_true", help="pool reagents shared by experiments")
+        command.add_argument("--compact", action="store_true", help="write configs in compact TrayConfig form")
+        command.add_argument("--variant", help="tray hardware variant from data/trays.json")
+
+    single = commands.add_parser("optimize", help="optimize one selection and print the result")
+    single.add_argument("experiments", nargs="+", type=int)
+    add_common(single)
+
+    batch = commands.add_parser("batch", help="optimize every selection in a CSV or JSONL file")
+    batch.add_argument("input", help="input file, or - for stdin")
+    batch.add_argument("--output", default="-", help="JSONL output file, or - for stdout")
+    batch.add_argument("--format", choices=("jsonl", "csv"), help="input format; guessed from the file name")
+    batch.add_argument("--workers", type=int, default=1)
+    batch.add_argument("--chunk-size", type=int, default=64)
+    add_common(batch)
+
+    args = parser.parse_args(argv)
+    try:
+        load_tray_data(args.variant)
+    except DataFileError as e:
+        parser.error(str(e))
+
+    if args.command == "optimize":
+        _init_worker(args.solver, args.share_reagents, args.compact, args.variant)
+        result = _optimize_order(None, None, args.experiments)
+        del result["line"], result["id"]
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 1 if "error" in result else 0
+
+    input_format = args.format or ("csv" if args.input.endswith(".csv") else "jsonl")
+    source = sys.stdin if args.input == "-" else open(args.input, newline="")
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    start = time.perf_counter()
+    try:
+        written, failed = run_batch(
+            read_orders(source, input_format), output, args.workers, args.chunk_size,
+            args.solver, args.share_reagents, args.compact, args.variant
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f"{written} orders ({failed} failed) in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import json
+import struct
+from array import array
+
+from tray_data import load_tray_data
+
+EMPTY = -1
+_MAGIC = b"TC"
+_VERSION = 1         # compact JSON form
+_BINARY_VERSION = 2  # v2 widened volumes to 32 bits and lengths to 16 bits
+_HEADER = struct.Struct("<2sBHHH")   # magic, version, locations, experiments, codes
+_LOCATION = struct.Struct("<hbbhIH")  # experiment, set, rank, code, volume, capacity
+
+
+def _calculate_tests(volume_ul, capacity_ml):
+    return int((capacity_ml * 1000) / volume_ul)
+
+
+class TrayConfig:
+    """Compact, array-backed tray configuration.
+
+    The per-location arrays are the only record of what is placed where.
+    Tests, set sizes and experiment totals are derived from them, and
+    ``to_dict()`` rebuilds the nested dict returned by
+    ``optimize_tray_configuration`` for code that expects that shape.
+
+    A location holds one reagent of one set: ``experiment`` owns it,
+    ``set_index`` is the set's position in that experiment's list and
+    ``rank`` the reagent's position within the set. Pooled locations list
+    every experiment drawing from them in ``shared_by``.
+    """
+
+    __slots__ = ("capacity", "experiment", "set_index", "rank", "code", "volume",
+                 "codes", "experiments", "names", "shared_by")
+
+    def __init__(self, capacities, experiments, names):
+        n = len(capacities)
+        self.capacity = array("H", capacities)
+        self.experiment = array("h", [EMPTY] * n)
+        self.set_index = array("b", [0] * n)
+        self.rank = array("b", [0] * n)
+        self.code = array("h", [EMPTY] * n)
+        # Pooled reagents carry their members' combined volume, which can
+        # pass the 16-bit limit of a single catalog volume
+        self.volume = array("I", [0] * n)
+        self.codes = []
+        self.experiments = list(experiments)
+        self.names = dict(names)
+        self.shared_by = {}
+
+    @classmethod
+    def from_dict(cls, config, location_capacities=None):
+        # The dict shape only records capacities of occupied locations
+        locations = config["tray_locations"]
+        location_capacities = location_capacities or load_tray_data().location_capacities
+        capacities = [entry["capacity"] if entry is not None else location_capacities[loc]
+                      for loc, entry in enumerate(locations)]
+
+        tray = cls(capacities, config["results"], {exp: r["name"] for exp, r in config["results"].items()})
+        code_index = {}
+        for exp_num, result in config["results"].items():
+            for set_index, set_info in enumerate(result["sets"]):
+                for rank, placement in enumerate(set_info["placements"]):
+                    loc = placement["location"]
+                    if tray.experiment[loc] != EMPTY:
+                        continue  # pooled location already recorded by its first user
+                    code = placement["reagent_code"]
+                    if code not in code_index:
+                        code_index[code] = len(tray.codes)
+                        tray.codes.append(code)
+                    tray.experiment[loc] = exp_num
+                    tray.set_index[loc] = set_index
+                    tray.rank[loc] = rank
+                    tray.code[loc] = code_index[code]
+                    tray.volume[loc] = placement["volume"]
+                    shared_by = locations[loc].get("shared_by")
+                    if shared_by:
+                        tray.shared_by[loc] = tuple(shared_by)
+        return tray
+
+    def __len__(self):
+        return len(self.capacity)
+
+    def users(self, loc):
+        if self.experiment[loc] == EMPTY:
+            return ()
+        return self.shared_by.get(loc) or (self.experiment[loc],)
+
+    def tests(self, loc):
+        if self.experiment[loc] == EMPTY:
+            return 0
+        return _calculate_tests(self.volume[loc], self.capacity[loc])
+
+    def sets(self, exp_num):
+        """Locations of each of ``exp_num``'s sets, in placement order."""
+        sets = {}
+        for loc in range(len(self)):
+            if exp_num in self.users(loc):
+                sets.setdefault(self.set_index[loc], []).append((self.rank[loc], loc))
+        return [[loc for _, loc in sorted(entries)] for _, entries in sorted(sets.items())]
+
+    def total_tests(self, exp_num):
+        return sum(min(self.tests(loc) for loc in locs) for locs in self.sets(exp_num))
+
+    @property
+    def tray_life(self):
+        return min((self.total_tests(exp) for exp in self.experiments), default=0)
+
+    def swap(self, source, target):
+        for loc in (source, target):
+            if not 0 <= loc < len(self):
+                raise ValueError(f"Invalid location: {loc}")
+        for column in (self.experiment, self.set_index, self.rank, self.code, self.volume):
+            column[source], column[target] = column[target], column[source]
+        shared_source = self.shared_by.pop(source, None)
+        shared_target = self.shared_by.pop(target, None)
+        if shared_source:
+            self.shared_by[target] = shared_source
+        if shared_target:
+            self.shared_by[source] = shared_target
+
+    def to_dict(self):
+        tray_locations = [None] * len(self)
+        placement_at = {}
+        for loc in range(len(self)):
+            if self.experiment[loc] == EMPTY:
+                continue
+            tests = self.tests(loc)
+            entry = {
+                "reagent_code": self.codes[self.code[loc]],
+                "experiment": self.experiment[loc],
+                "tests_possible": tests,
+                "volume_per_test": self.volume[loc],
+                "capacity": self.capacity[loc]
+            }
+            if loc in self.shared_by:
+                entry["shared_by"] = list(self.shared_by[loc])
+            tray_locations[loc] = entry
+            placement_at[loc] = {
+                "reagent_code": entry["reagent_code"],
+                "location": loc,
+                "tests": tests,
+                "volume": self.volume[loc]
+            }
+
+        results = {}
+        for exp_num in self.experiments:
+            sets = []
+            for locs in self.sets(exp_num):
+                placements = [placement_at[loc] for loc in locs]
+                sets.append({
+                    "placements": placements,
+                    "tests_per_set": min(p["tests"] for p in placements)
+                })
+            results[exp_num] = {
+                "name": self.names[exp_num],
+                "sets": sets,
+                "total_tests": sum(s["tests_per_set"] for s in sets)
+            }
+            shared_with = {other for loc in self.shared_by for other in self.shared_by[loc]
+                           if exp_num in self.shared_by[loc] and other != exp_num}
+            if shared_with:
+                results[exp_num]["shared_with"] = sorted(shared_with)
+
+        return {
+            "tray_locations": tray_locations,
+            "results": results,
+            "available_locations": {loc for loc in range(len(self)) if self.experiment[loc] == EMPTY}
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_jsonable(), separators=(",", ":"))
+
+    def to_jsonable(self):
+        """Compact form: one ``[experiment, set, rank, code, volume]`` row per location (0 if empty)."""
+        rows = [
+            [self.experiment[loc], self.set_index[loc], self.rank[loc], self.code[loc], self.volume[loc]]
+            if self.experiment[loc] != EMPTY else 0
+            for loc in range(len(self))
+        ]
+        return {
+            "v": _VERSION,
+            "capacity": self.capacity.tolist(),
+            "experiments": [[exp, self.names[exp]] for exp in self.experiments],
+            "codes": self.codes,
+            "locations": rows,
+            "shared_by": {str(loc): list(users) for loc, users in self.shared_by.items()}
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if isinstance(data, (str, bytes)):
+            data = json.loads(data)
+        if data.get("v") != _VERSION:
+            raise ValueError(f"Unsupported tray config version: {data.get('v')}")
+        # The typed arrays reject out-of-range values with OverflowError;
+        # callers treat a malformed payload as a ValueError
+        try:
+            tray = cls(data["capacity"], [exp for exp, _ in data["experiments"]], data["experiments"])
+        except OverflowError as e:
+            raise ValueError(f"Invalid tray capacities: {e}") from None
+        tray.codes = list(data["codes"])
+        for loc, row in enumerate(data["locations"]):
+            if row:
+                try:
+                    (tray.experiment[loc], tray.set_index[loc], tray.rank[loc],
+                     tray.code[loc], tray.volume[loc]) = row
+                except OverflowError as e:
+                    raise ValueError(f"Invalid row for location {loc}: {e}") from None
+        tray.shared_by = {int(loc): tuple(users) for loc, users in data.get("shared_by", {}).items()}
+        return tray
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(_MAGIC, _BINARY_VERSION, len(self), len(self.experiments), len(self.codes))]
+        for exp in self.experiments:
+            name = self.names[exp].encode("utf-8")
+            parts.append(struct.pack("<hH", exp, len(name)) + name)
+        for code in self.codes:
+            encoded = code.encode("utf-8")
+            parts.append(struct.pack("<H", len(encoded)) + encoded)
+        for loc in range(len(self)):
+            parts.append(_LOCATION.pack(self.experiment[loc], self.set_index[loc], self.rank[loc],
+                                        self.code[loc], self.volume[loc], self.capacity[loc]))
+        parts.append(struct.pack("<H", len(self.shared_by)))
+        for loc, users in self.shared_by.items():
+            parts.append(struct.pack(f"<HH{len(users)}h", loc, len(users), *users))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, num_locations, num_experiments, num_codes = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _BINARY_VERSION:
+            raise ValueError("Not a serialized tray config")
+        offset = _HEADER.size
+
+        experiments, names = [], {}
+        for _ in range(num_experiments):
+            exp, length = struct.unpack_from("<hH", data, offset)
+            offset += 4
+            names[exp] = bytes(data[offset:offset + length]).decode("utf-8")
+            experiments.append(exp)
+            offset += length
+
+        codes = []
+        for _ in range(num_codes):
+            (length,) = struct.unpack_from("<H", data, offset)
+            codes.append(bytes(data[offset + 2:offset + 2 + length]).decode("utf-8"))
+            offset += 2 + length
+
+        tray = cls([0] * num_locations, experiments, names)
+        tray.codes = codes
+        for loc in range(num_locations):
+            (tray.experiment[loc], tray.set_index[loc], tray.rank[loc],
+             tray.code[loc], tray.volume[loc], tray.capacity[loc]) = _LOCATION.unpack_from(data, offset)
+            offset += _LOCATION.size
+
+        (num_shared,) = struct.unpack_from("<H", data, offset)
+        offset += 2
+        for _ in range(num_shared):
+            loc, count = struct.unpack_from("<HH", data, offset)
+            tray.shared_by[loc] = struct.unpack_from(f"<{count}h", data, offset + 4)
+            offset += 4 + 2 * count
+        return tray
@@ -0,0 +1,248 @@
+"""Tray hardware variants, experiment catalog and reagent colors from data files.
+
+The data directory holds:
+
+    trays.json        hardware variants: per-location capacities and grid columns
+    experiments.json  experiment catalog (or experiments.csv with one row per
+                      reagent: experiment,name,code,vol)
+    colors.json       reagent code prefixes per display color
+
+``CFTRAY_DATA_DIR`` points at another data directory and ``CFTRAY_TRAY_VARIANT``
+selects a variant other than the file's default. Files are validated once per
+distinct content; later loads of the same bytes reuse the compiled result.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+from types import MappingProxyType
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SUPPORTED_FORMAT = 1
+
+_compiled = {}
+_loaded = {}
+
+
+class DataFileError(ValueError):
+    """Raised when a data file is missing or does not validate."""
+
+    def __init__(self, path, message):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+
+
+class TrayData:
+    """Validated, immutable view of one hardware variant and its catalog."""
+
+    __slots__ = ("variant", "location_capacities", "columns", "experiment_data",
+                 "colors", "default_color", "version", "_color_index")
+
+    def __init__(self, variant, location_capacities, columns, experiment_data, colors, default_color, version):
+        set_ = object.__setattr__
+        set_(self, "variant", variant)
+        set_(self, "location_capacities", tuple(location_capacities))
+        set_(self, "columns", columns)
+        set_(self, "experiment_data", MappingProxyType(experiment_data))
+        set_(self, "colors", MappingProxyType({color: tuple(codes) for color, codes in colors.items()}))
+        set_(self, "default_color", default_color)
+        set_(self, "version", version)
+        set_(self, "_color_index", {code: color for color, codes in self.colors.items() for code in codes})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, TrayData) and self.version == other.version
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __repr__(self):
+        return f"TrayData(variant={self.variant!r}, version={self.version!r})"
+
+    @property
+    def capacity_classes(self):
+        return tuple(sorted(set(self.location_capacities), reverse=True))
+
+    def reagent_color(self, reagent_code):
+        color = self._color_index.get(reagent_code)
+        if color is None:
+            color = next(
+                (color for color, codes in self.colors.items() if any(reagent_code.startswith(c) for c in codes)),
+                self.default_color,
+            )
+            self._color_index[reagent_code] = color
+        return color
+
+
+def _stat(data_dir, *names):
+    for name in names:
+        path = os.path.join(data_dir, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        return path, st.st_mtime_ns, st.st_size
+    raise DataFileError(os.path.join(data_dir, names[0]), "file not found")
+
+
+def _read(data_dir, *names):
+    for name in names:
+        path = os.path.join(data_dir, name)
+        try:
+            with open(path, "rb") as f:
+                return path, f.read()
+        except FileNotFoundError:
+            continue
+    raise DataFileError(os.path.join(data_dir, names[0]), "file not found")
+
+
+def _load_json(path, raw):
+    try:
+        document = json.loads(raw)
+    except ValueError as e:
+        raise DataFileError(path, f"invalid JSON: {e}") from None
+    if not isinstance(document, dict):
+        raise DataFileError(path, "expected a JSON object")
+    if document.get("format") != SUPPORTED_FORMAT:
+        raise DataFileError(path, f"unsupported format {document.get('format')!r}, expected {SUPPORTED_FORMAT}")
+    return document
+
+
+def _positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _parse_variant(path, raw, variant):
+    document = _load_json(path, raw)
+    variants = document.get("variants")
+    if not isinstance(variants, dict) or not variants:
+        raise DataFileError(path, "'variants' must be a non-empty object")
+    variant = variant or document.get("default")
+    if variant not in variants:
+        raise DataFileError(path, f"unknown variant {variant!r}; available: {', '.join(sorted(variants))}")
+
+    spec = variants[variant]
+    capacities = spec.get("location_capacities")
+    if not isinstance(capacities, list) or not capacities or not all(_positive_int(c) for c in capacities):
+        raise DataFileError(path, f"variant {variant!r}: 'location_capacities' must be a list of positive integers (mL)")
+    if max(capacities) > 0xFFFF:
+        raise DataFileError(path, f"variant {variant!r}: capacities above {0xFFFF} mL are not supported")
+    columns = spec.get("columns", 4)
+    if not _positive_int(columns):
+        raise DataFileError(path, f"variant {variant!r}: 'columns' must be a positive integer")
+    return variant, capacities, columns
+
+
+def _parse_experiments(path, raw):
+    if path.endswith(".csv"):
+        experiments = {}
+        try:
+            for row in csv.DictReader(io.StringIO(raw.decode("utf-8"))):
+                exp = experiments.setdefault(row["experiment"], {"name": row["name"], "reagents": []})
+                exp["reagents"].append({"code": row["code"], "vol": int(row["vol"])})
+        except (KeyError, ValueError) as e:
+            raise DataFileError(path, f"expected columns experiment,name,code,vol ({e})") from None
+    else:
+        experiments = _load_json(path, raw).get("experiments")
+        if not isinstance(experiments, dict):
+            raise DataFileError(path, "'experiments' must be an object keyed by experiment number")
+
+    experiment_data = {}
+    for key, exp in experiments.items():
+        try:
+            exp_id = int(key)
+        except ValueError:
+            raise DataFileError(path, f"experiment id {key!r} is not an integer") from None
+        if not 0 <= exp_id <= 0x7FFF:
+            raise DataFileError(path, f"experiment id {exp_id} must be between 0 and {0x7FFF}")
+        if exp_id in experiment_data:
+            raise DataFileError(path, f"experiment {exp_id} is defined twice")
+        if not isinstance(exp, dict) or not isinstance(exp.get("name"), str):
+            raise DataFileError(path, f"experiment {exp_id}: 'name' must be a string")
+        reagents = exp.get("reagents")
+        if not isinstance(reagents, list) or not reagents:
+            raise DataFileError(path, f"experiment {exp_id}: 'reagents' must be a non-empty list")
+        for reagent in reagents:
+            if not isinstance(reagent, dict) or not isinstance(reagent.get("code"), str) or not reagent["code"]:
+                raise DataFileError(path, f"experiment {exp_id}: every reagent needs a 'code'")
+            if not _positive_int(reagent.get("vol")) or reagent["vol"] > 0xFFFF:
+                raise DataFileError(path, f"experiment {exp_id}: reagent {reagent['code']} needs a positive 'vol' in uL")
+        codes = [reagent["code"] for reagent in reagents]
+        if len(set(codes)) != len(codes):
+            raise DataFileError(path, f"experiment {exp_id}: duplicate reagent codes")
+        experiment_data[exp_id] = {
+            "name": exp["name"],
+            "reagents": [{"code": reagent["code"], "vol": reagent["vol"]} for reagent in reagents],
+        }
+    if not experiment_data:
+        raise DataFileError(path, "no experiments defined")
+    return dict(sorted(experiment_data.items()))
+
+
+def _parse_colors(path, raw):
+    document = _load_json(path, raw)
+    colors = document.get("colors")
+    if not isinstance(colors, dict) or not all(
+        isinstance(codes, list) and all(isinstance(code, str) and code for code in codes) for codes in colors.values()
+    ):
+        raise DataFileError(path, "'colors' must map color names to lists of reagent code prefixes")
+    default = document.get("default", "lightgray")
+    if not isinstance(default, str):
+        raise DataFileError(path, "'default' must be a color name")
+    return colors, default
+
+
+def _compile(files, variant):
+    (trays_path, trays_raw), (experiments_path, experiments_raw), (colors_path, colors_raw) = files
+    variant, capacities, columns = _parse_variant(trays_path, trays_raw, variant)
+    experiment_data = _parse_experiments(experiments_path, experiments_raw)
+    colors, default_color = _parse_colors(colors_path, colors_raw)
+
+    # Each experiment must fit on the tray on its own with at least one test
+    for exp_id, exp in experiment_data.items():
+        if len(exp["reagents"]) > len(capacities):
+            raise DataFileError(experiments_path, f"experiment {exp_id} needs more locations than variant {variant!r} has")
+        if any(max(capacities) * 1000 < reagent["vol"] for reagent in exp["reagents"]):
+            raise DataFileError(experiments_path, f"experiment {exp_id} has a reagent larger than any location")
+
+    digest = hashlib.sha256()
+    for _, raw in files:
+        digest.update(hashlib.sha256(raw).digest())
+    digest.update(variant.encode("utf-8"))
+    return TrayData(variant, capacities, columns, experiment_data, colors, default_color, digest.hexdigest()[:16])
+
+
+def load_tray_data(variant=None, data_dir=None):
+    """Load, validate and compile the data files for ``variant``.
+
+    ``variant`` and ``data_dir`` default to ``CFTRAY_TRAY_VARIANT`` and
+    ``CFTRAY_DATA_DIR``, then to the file's default variant and the bundled
+    ``data/`` directory. The compiled result is shared by every caller that
+    reads the same file contents. Files are only re-read and hashed when
+    their modification time or size changes.
+    """
+    data_dir = data_dir or os.environ.get("CFTRAY_DATA_DIR") or DATA_DIR
+    variant = variant or os.environ.get("CFTRAY_TRAY_VARIANT") or None
+    stamps = (
+        _stat(data_dir, "trays.json"),
+        _stat(data_dir, "experiments.json", "experiments.csv"),
+        _stat(data_dir, "colors.json"),
+    )
+    loaded = _loaded.get((data_dir, variant))
+    if loaded is not None and loaded[0] == stamps:
+        return loaded[1]
+
+    files = (
+        _read(data_dir, "trays.json"),
+        _read(data_dir, "experiments.json", "experiments.csv"),
+        _read(data_dir, "colors.json"),
+    )
+    key = (tuple((path, hashlib.sha256(raw).digest()) for path, raw in files), variant)
+    data = _compiled.get(key)
+    if data is None:
+        data = _compiled[key] = _compile(files, variant)
+    _loaded[(data_dir, variant)] = (stamps, data)
+    return data
@@ -0,0 +1,134 @@
+import threading
+
+from reagent_optimizer import ReagentOptimizer
+
+_default_optimizer = None
+_default_lock = threading.Lock()
+
+
+def default_optimizer():
+    """Optimizer shared by editors created without one."""
+    global _default_optimizer
+    with _default_lock:
+        if _default_optimizer is None:
+            _default_optimizer = ReagentOptimizer()
+        return _default_optimizer
+
+
+class TrayEditor:
+    """Applies manual location swaps to an optimized config in place.
+
+    Each swap only touches the placements at the two locations, the sets they
+    belong to and those experiments' totals, so edits stay O(reagents touched)
+    regardless of how many sets the tray holds.
+    """
+
+    def __init__(self, config, optimizer=None):
+        self.config = config
+        self.optimizer = optimizer or default_optimizer()
+        self._history = []
+
+        # location -> [(experiment, set_info, placement)]; pooled reagents
+        # shared by several experiments have one entry per experiment
+        self._index = {}
+        for exp_num, result in config["results"].items():
+            for set_info in result["sets"]:
+                for placement in set_info["placements"]:
+                    self._index.setdefault(placement["location"], []).append((exp_num, set_info, placement))
+
+        self.tray_life = self._min_total_tests()
+
+    def swap(self, source, target):
+        return self.apply_swaps([(source, target)])
+
+    def apply_swaps(self, swaps):
+        swaps = [tuple(pair) for pair in swaps]
+        # Reject the whole batch before any swap changes the config
+        for pair in swaps:
+            if len(pair) != 2:
+                raise ValueError(f"Invalid swap: {pair}")
+            for loc in pair:
+                self._check_location(loc)
+        touched = set()
+        for source, target in swaps:
+            touched.update(self._swap(source, target))
+        self._history.append(swaps)
+        self._update_tray_life(touched)
+        return self.tray_life
+
+    def undo(self):
+        if not self._history:
+            raise ValueError("Nothing to undo")
+
+        # Every swap is its own inverse, so replaying a batch backwards restores it
+        swaps = self._history.pop()
+        touched = set()
+        for source, target in reversed(swaps):
+            touched.update(self._swap(source, target))
+        self._update_tray_life(touched)
+        return self.tray_life
+
+    @property
+    def can_undo(self):
+        return bool(self._history)
+
+    def _check_location(self, loc):
+        if not 0 <= loc < self.optimizer.MAX_LOCATIONS:
+            raise ValueError(f"Invalid location: {loc}")
+
+    def _swap(self, source, target):
+        if source == target:
+            return ()
+
+        locations = self.config["tray_locations"]
+        locations[source], locations[target] = locations[target], locations[source]
+
+        moved_from_source = self._index.pop(source, [])
+        moved_from_target = self._index.pop(target, [])
+        touched_sets = []
+        for entries, new_loc in ((moved_from_source, target), (moved_from_target, source)):
+            if not entries:
+                continue
+            self._index[new_loc] = entries
+            for entry in entries:
+                self._move_placement(entry[2], locations[new_loc], new_loc)
+            touched_sets.extend(entries)
+
+        available = self.config["available_locations"]
+        for loc in (source, target):
+            if locations[loc] is None:
+                available.add(loc)
+            else:
+                available.discard(loc)
+
+        touched = set()
+        seen_sets = set()
+        for exp_num, set_info, _ in touched_sets:
+            if id(set_info) in seen_sets:
+                continue
+            seen_sets.add(id(set_info))
+            set_tests = min(p["tests"] for p in set_info["placements"])
+            self.config["results"][exp_num]["total_tests"] += set_tests - set_info["tests_per_set"]
+            set_info["tests_per_set"] = set_tests
+            touched.add(exp_num)
+        return touched
+
+    def _move_placement(self, placement, tray_entry, new_loc):
+        capacity = self.optimizer.location_capacities[new_loc]
+        tests = self.optimizer.calculate_tests(placement["volume"], capacity)
+        placement["location"] = new_loc
+        placement["tests"] = tests
+        tray_entry["tests_possible"] = tests
+        tray_entry["capacity"] = capacity
+
+    def _update_tray_life(self, touched):
+        results = self.config["results"]
+        lowest = min((results[exp]["total_tests"] for exp in touched), default=self.tray_life)
+        if lowest <= self.tray_life:
+            self.tray_life = lowest
+        else:
+            # The previous minimum may have been raised; only then rescan
+            self.tray_life = self._min_total_tests()
+
+    def _min_total_tests(self):
+        return min((result["total_tests"] for result in self.config["results"].values()), default=0)
@@ -0,0 +1,179 @@
+import numpy as np
+
+
+class SimulationResult:
+    """Outcome of a depletion run. Times are in the units of the event times;
+    ``inf`` means the experiment or tray did not run out during the events."""
+
+    __slots__ = (
+        "pair_tray", "pair_experiment", "pair_total_tests", "tests_served", "tests_requested",
+        "runout_time", "tray_runout_time", "slot_tray", "slot_location", "remaining_ul", "capacity_ul",
+    )
+
+    def __init__(self, **arrays):
+        for name, value in arrays.items():
+            setattr(self, name, value)
+
+    def experiment_runout(self, tray, experiment):
+        match = np.flatnonzero((self.pair_tray == tray) & (self.pair_experiment == experiment))
+        if match.size == 0:
+            raise KeyError(f"Experiment {experiment} is not on tray {tray}")
+        return float(self.runout_time[match[0]])
+
+    def remaining_fraction(self):
+        return self.remaining_ul / self.capacity_ul
+
+
+class DepletionSimulator:
+    """Vectorized reagent depletion for one or many optimized trays.
+
+    Each test event draws ``volume_per_test`` from every reagent of the
+    experiment's active set. Sets are used in the order the optimizer listed
+    them: the primary set first, then each additional set once the previous
+    one can no longer run a test. Because a set is exhausted after exactly
+    ``tests_per_set`` tests, the whole simulation reduces to counting events
+    per (tray, experiment) pair, which is done with array operations rather
+    than a Python loop over events. Pooled locations follow the optimizer's
+    model of members testing in lockstep.
+    """
+
+    def __init__(self, configs):
+        if isinstance(configs, dict):
+            configs = [configs]
+        self.num_trays = len(configs)
+
+        pair_tray, pair_exp, pair_total = [], [], []
+        slot_pair, slot_start, slot_tests, slot_volume, slot_row = [], [], [], [], []
+        slot_tray, slot_location, slot_capacity = [], [], []
+        location_row = {}
+
+        for tray, config in enumerate(configs):
+            for exp_num, result in config["results"].items():
+                pair = len(pair_tray)
+                pair_tray.append(tray)
+                pair_exp.append(exp_num)
+                pair_total.append(result["total_tests"])
+                start = 0
+                for set_info in result["sets"]:
+                    for placement in set_info["placements"]:
+                        loc = placement["location"]
+                        entry = config["tray_locations"][loc]
+                        users = len(entry.get("shared_by", ())) or 1
+                        key = (tray, loc)
+                        if key not in location_row:
+                            location_row[key] = len(slot_tray)
+                            slot_tray.append(tray)
+                            slot_location.append(loc)
+                            slot_capacity.append(entry["capacity"] * 1000)
+                        slot_row.append(location_row[key])
+                        slot_pair.append(pair)
+                        slot_start.append(start)
+                        slot_tests.append(set_info["tests_per_set"])
+                        slot_volume.append(placement["volume"] / users)
+                    start += set_info["tests_per_set"]
+
+        self.pair_tray = np.array(pair_tray, dtype=np.int64)
+        self.pair_experiment = np.array(pair_exp, dtype=np.int64)
+        self.pair_total = np.array(pair_total, dtype=np.int64)
+
+        # One row per (pair, placement); rows sharing a location are summed
+        self._row_pair = np.array(slot_pair, dtype=np.int64)
+        self._row_start = np.array(slot_start, dtype=np.int64)
+        self._row_tests = np.array(slot_tests, dtype=np.int64)
+        self._row_volume = np.array(slot_volume, dtype=np.float64)
+        self._row_slot = np.array(slot_row, dtype=np.int64)
+        self.slot_tray = np.array(slot_tray, dtype=np.int64)
+        self.slot_location = np.array(slot_location, dtype=np.int64)
+        self.slot_capacity_ul = np.array(slot_capacity, dtype=np.float64)
+
+        # Dense (tray, experiment) -> pair lookup for mapping event streams
+        max_exp = int(self.pair_experiment.max()) if len(pair_exp) else 0
+        self._pair_lookup = np.full((self.num_trays, max_exp + 1), -1, dtype=np.int64)
+        self._pair_lookup[self.pair_tray, self.pair_experiment] = np.arange(len(pair_exp))
+
+    def simulate(self, times, experiments, trays=None, until=None):
+        """Run a stream of test events.
+
+        ``times`` and ``experiments`` are equal-length arrays. With ``trays``
+        each event hits only that tray; without it, every tray hosting the
+        experiment runs the test (a shared schedule). Events after ``until``
+        are ignored.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        experiments = np.asarray(experiments, dtype=np.int64)
+        if until is not None:
+            keep = times <= until
+            times, experiments = times[keep], experiments[keep]
+            trays = None if trays is None else np.asarray(trays, dtype=np.int64)[keep]
+
+        max_exp = self._pair_lookup.shape[1] - 1
+        in_catalog = (experiments >= 0) & (experiments <= max_exp)
+        times, experiments = times[in_catalog], experiments[in_catalog]
+
+        if trays is None:
+            # Group events by experiment; every pair reads its experiment's group
+            groups = experiments
+            num_groups = max_exp + 1
+            pair_group = self.pair_experiment
+        else:
+            trays = np.asarray(trays, dtype=np.int64)[in_catalog]
+            groups = self._pair_lookup[trays, experiments]
+            hosted = groups >= 0
+            times, groups = times[hosted], groups[hosted]
+            num_groups = len(self.pair_total)
+            pair_group = np.arange(len(self.pair_total))
+
+        order = np.lexsort((times, groups))
+        sorted_times = times[order]
+        group_count = np.bincount(groups, minlength=num_groups)
+        group_start = np.concatenate(([0], np.cumsum(group_count)[:-1]))
+
+        requested = group_count[pair_group]
+        served = np.minimum(requested, self.pair_total)
+
+        # The first request beyond total_tests is when the experiment runs out
+        runs_out = requested > self.pair_total
+        runout_index = np.where(runs_out, group_start[pair_group] + self.pair_total, 0)
+        runout_time = np.where(runs_out, sorted_times[runout_index] if sorted_times.size else 0.0, np.inf)
+
+        tray_runout = np.full(self.num_trays, np.inf)
+        np.minimum.at(tray_runout, self.pair_tray, runout_time)
+
+        return SimulationResult(
+            pair_tray=self.pair_tray,
+            pair_experiment=self.pair_experiment,
+            pair_total_tests=self.pair_total,
+            tests_served=served,
+            tests_requested=requested,
+            runout_time=runout_time,
+            tray_runout_time=tray_runout,
+            slot_tray=self.slot_tray,
+            slot_location=self.slot_location,
+            remaining_ul=self._remaining(served),
+            capacity_ul=self.slot_capacity_ul,
+        )
+
+    def simulate_schedule(self, tests_per_day, days, start=0.0):
+        """Run a fixed daily rate per experiment on every tray for ``days`` days."""
+        times, experiments = schedule_events(tests_per_day, days, start)
+        return self.simulate(times, experiments)
+
+    def _remaining(self, served):
+        # Tests drawn from each set row: the part of ``served`` inside its window
+        used = np.clip(served[self._row_pair] - self._row_start, 0, self._row_tests)
+        consumed = np.bincount(self._row_slot, weights=used * self._row_volume, minlength=len(self.slot_tray))
+        return self.slot_capacity_ul - consumed
+
+
+def schedule_events(tests_per_day, days, start=0.0):
+    """Evenly spaced test events for ``{experiment: tests per day}`` over ``days``."""
+    times, experiments = [], []
+    for exp_num, rate in tests_per_day.items():
+        count = int(rate * days)
+        if count <= 0:
+            continue
+        times.append(start + np.arange(1, count + 1, dtype=np.float64) / rate)
+        experiments.append(np.full(count, exp_num, dtype=np.int64))
+    if not times:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    return np.concatenate(times), np.concatenate(experiments)